@@ -35,19 +35,22 @@ logger = logging.getLogger(__name__)
 # ==========================================================
 from aiohttp import web
 from hydrogram import Client, types
+from hydrogram.errors import FloodWait
 from web import web_app
 from info import (
     API_ID, API_HASH, BOT_TOKEN, PORT, ADMINS, 
-    LOG_CHANNEL, DATABASE_URL, DATABASE_NAME
+    LOG_CHANNEL, DATABASE_URL, DATABASE_NAME,
+    FETCH_WORKERS, FETCH_LOOKAHEAD, FETCH_RETRIES
 )
 from utils import temp
 from database.users_chats_db import db
 
 # ⚡ IMPORTANT: Import Database Indexer
-from database.ia_filterdb import ensure_indexes
+from database.ia_filterdb import ensure_indexes, load_search_indexes
 
 # -------------------- IMPORT PREMIUM MODULE --------------------
 from plugins.premium import check_premium_expired
+from plugins.index import resume_index_jobs
 
 # ==========================================================
 # BOT CLASS
@@ -70,8 +73,12 @@ class Bot(Client):
         # 2. Initialize Database Indexes (Background Task)
         # यह सर्च को सुपर फास्ट बनाने के लिए जरूरी है
         await ensure_indexes()
+        await db.ensure_indexes()
         logger.info("✅ Database Indexes Checked/Created")
 
+        # RAM title index + spell dictionary — load होने तक search Mongo से चलेगा
+        asyncio.create_task(load_search_indexes())
+
         # 3. Load banned users & chats (Async)
         try:
             b_users, b_chats = await db.get_banned()
@@ -111,7 +118,10 @@ class Bot(Client):
         # 7. Start Premium Checker Task
         asyncio.create_task(check_premium_expired(self))
 
-        # 8. Send Startup Logs
+        # 8. Unfinished Indexing Jobs (Resume / Offer)
+        asyncio.create_task(resume_index_jobs(self))
+
+        # 9. Send Startup Logs
         ist = pytz.timezone("Asia/Kolkata")
         now = datetime.now(ist)
         date_str = now.strftime("%d %B %Y")
@@ -149,27 +159,76 @@ class Bot(Client):
         await super().stop()
         logger.info("Bot stopped. Bye 👋")
 
-    # Custom iterator (Keeping your logic)
+    # Custom iterator: batches fetched ahead by FETCH_WORKERS tasks,
+    # yielded strictly in id order
     async def iter_messages(
         self: Client,
         chat_id: Union[int, str],
         limit: int,
-        offset: int = 0
+        offset: int = 0,
+        budget=None
     ) -> Optional[AsyncGenerator["types.Message", None]]:
-        current = offset
-        while current < limit:
-            diff = min(200, limit - current)
-            try:
-                messages = await self.get_messages(
-                    chat_id,
-                    list(range(current, current + diff))
-                )
-                for message in messages:
+        """`budget`: optional shared TokenBucket, one token per get_messages call"""
+        starts = range(offset, limit, 200)
+        ready = {}                      # batch no -> messages / Exception
+        arrived = asyncio.Condition()
+        slots = asyncio.Semaphore(max(FETCH_LOOKAHEAD, 1))
+        flood = {"until": 0.0}          # shared FloodWait deadline (monotonic)
+        next_batch = 0
+
+        async def worker():
+            nonlocal next_batch
+            while True:
+                await slots.acquire()
+                if next_batch >= len(starts):
+                    slots.release()
+                    return
+                n = next_batch
+                next_batch += 1
+                start = starts[n]
+                result = await self._fetch_batch(chat_id, start, min(200, limit - start), flood, budget)
+                async with arrived:
+                    ready[n] = result
+                    arrived.notify_all()
+
+        workers = [asyncio.create_task(worker()) for _ in range(max(FETCH_WORKERS, 1))]
+        try:
+            for n in range(len(starts)):
+                async with arrived:
+                    await arrived.wait_for(lambda: n in ready)
+                    batch = ready.pop(n)
+                slots.release()
+                if isinstance(batch, Exception):
+                    raise batch
+                for message in batch:
                     yield message
-                current += diff
+        finally:
+            for task in workers:
+                task.cancel()
+
+    async def _fetch_batch(self, chat_id, start, count, flood, budget=None):
+        """One get_messages call; FloodWait pauses all workers, other errors retry"""
+        ids = list(range(start, start + count))
+        attempt = 0
+        while True:
+            delay = flood["until"] - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if budget is not None:
+                await budget.acquire()
+            try:
+                return await self.get_messages(chat_id, ids)
+            except FloodWait as e:
+                logger.warning(f"FloodWait {e.value}s while fetching messages {start}-{start + count - 1}")
+                flood["until"] = max(flood["until"], time.monotonic() + e.value + 1)
+                if budget is not None:
+                    budget.penalize(e.value + 1)
             except Exception as e:
-                logger.error(f"Error fetching messages: {e}")
-                return
+                attempt += 1
+                if attempt > FETCH_RETRIES:
+                    logger.error(f"Error fetching messages {start}-{start + count - 1}: {e}")
+                    return e
+                await asyncio.sleep(min(2 ** attempt, 30))
 
 # ==========================================================
 # MAIN EXECUTION
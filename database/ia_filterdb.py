@@ -1,11 +1,26 @@
 import logging
+import asyncio
 import re
+import math
+import time
 import base64
+import hashlib
 from struct import pack
+from collections import OrderedDict
 import motor.motor_asyncio
 from hydrogram.file_id import FileId
-from pymongo.errors import DuplicateKeyError
-from info import DATABASE_URL, DATABASE_NAME, MAX_BTN
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError, BulkWriteError
+from info import (
+    DATABASE_URL, DATABASE_NAME, MAX_BTN, CACHE_TIME, SEARCH_CACHE_MB,
+    LANGUAGES, QUALITY, FILE_CACHE_SIZE, DELETE_BATCH_SIZE, DELETE_PAUSE_MS,
+    SEARCH_FANOUT, SEARCH_FACET, SEARCH_COUNT_CAP, MEMORY_INDEX,
+    FUZZY_MIN_SCORE, SPELL_CHECK, SPELL_MAX_EDIT, SPELL_MIN_COUNT, CROSS_DEDUPE,
+    USE_CAPTION_FILTER, COMPACT_SCHEMA, MIGRATE_PAUSE_MS, SEARCH_TIMEOUT_MS,
+    INDEX_BATCH_SIZE, INDEX_FLUSH_MS
+)
+from database.memory_index import TitleIndex, make_grams
+from database.spell_check import SymSpell
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +45,9 @@ COLLECTIONS = {
     "archive": archive
 }
 
+# One-letter collection hint carried in file deep links (file{code}_...)
+COLLECTION_CODES = {"p": "primary", "c": "cloud", "a": "archive"}
+
 # ─────────────────────────────────────────
 # ⚡ INDEXES (BACKGROUND)
 # ─────────────────────────────────────────
@@ -43,6 +61,9 @@ async def ensure_indexes():
                 name=f"{name}_text",
                 background=True  # बोट को रोके बिना इंडेक्स बनाएगा
             )
+            # trigrams (typo / partial fallback), filter tags, fingerprint
+            for field in (F_GRAMS, F_LANG, F_QUALITY, F_YEAR, F_FP):
+                await col.create_index(field, name=f"{name}_{field}", background=True)
         except Exception as e:
             logger.error(f"Index creation failed for {name}: {e}")
 
@@ -60,9 +81,283 @@ def normalize_query(q: str) -> str:
     q = re.sub(r"[^a-z0-9\s]", " ", q)
     return re.sub(r"\s+", " ", q).strip()
 
-def prefix_query(q: str) -> str:
-    """Create prefix query for fallback"""
-    return " ".join(w[:4] for w in q.split() if len(w) >= 3)
+def split_year(query):
+    """"Avengers 2019" → ("Avengers", 2019); a query that is only a year stays text"""
+    m = YEAR_RE.search(query)
+    if not m:
+        return query, None
+    rest = query[:m.start()] + " " + query[m.end():]
+    if not normalize_query(rest):
+        return query, None
+    return rest, int(m.group(1))
+
+def title_grams(text):
+    """Trigram set stored in `grams` for fuzzy search"""
+    return make_grams(normalize_query(text or "").split())
+
+# Language / quality tags (LANGUAGES, QUALITY in info.py) → bit per tag for RAM index
+TAG_BITS = {t: 1 << i for i, t in enumerate(dict.fromkeys(LANGUAGES + QUALITY))}
+YEAR_RE = re.compile(r"\b(19[3-9]\d|20\d\d)\b")
+
+# Bump when derived_fields() changes so /backfill rewrites old docs
+DERIVED_VERSION = 4
+
+# Derived field names. COMPACT_SCHEMA uses one-letter keys (BSON repeats every
+# key in every doc). file_name / file_size / caption keep their names — the
+# text index and file delivery read them. Flag बदलने के बाद /migrate चलाओ:
+# docs नए names में लिखे जाते हैं और दूसरे set के fields/indexes हटते हैं।
+LONG_FIELDS = ("grams", "lang", "quality", "year", "fp", "dv")
+SHORT_FIELDS = ("g", "l", "q", "y", "f", "v")
+FIELDS, OTHER_FIELDS = (SHORT_FIELDS, LONG_FIELDS) if COMPACT_SCHEMA else (LONG_FIELDS, SHORT_FIELDS)
+F_GRAMS, F_LANG, F_QUALITY, F_YEAR, F_FP, F_VER = FIELDS
+
+def extract_tags(file_name, caption=""):
+    """lang / quality / year tags from the raw name and caption"""
+    text = f"{file_name} {caption or ''}".lower()
+    words = set(re.findall(r"[a-z0-9]+", text))
+    year = YEAR_RE.search(text)
+    return {
+        "lang": [l for l in LANGUAGES if l in words],
+        "quality": [q for q in QUALITY if q in words],
+        "year": int(year.group(1)) if year else None
+    }
+
+def tag_mask(lang=None, quality=None):
+    """Required tag bits for a RAM index lookup"""
+    return TAG_BITS.get(lang, 0) | TAG_BITS.get(quality, 0)
+
+def doc_tag_bits(doc):
+    bits = 0
+    for tag in doc.get(F_LANG, []) + doc.get(F_QUALITY, []):
+        bits |= TAG_BITS.get(tag, 0)
+    return bits
+
+def fingerprint(file_name, file_size):
+    """Same size + same normalized name = same file, whichever collection it's in"""
+    key = f"{file_size or 0}:{normalize_query(file_name or '')}"
+    return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+def derived_fields(file_name, caption="", file_size=0):
+    """Search helper fields computed from name/caption at save time"""
+    tags = extract_tags(file_name, caption)
+    return {
+        F_GRAMS: title_grams(file_name),
+        F_LANG: tags["lang"],
+        F_QUALITY: tags["quality"],
+        F_YEAR: tags["year"],
+        F_FP: fingerprint(file_name, file_size),
+        F_VER: DERIVED_VERSION
+    }
+
+# ─────────────────────────────────────────
+# 🗃️ SEARCH RESULT CACHE (LRU + TTL)
+# ─────────────────────────────────────────
+class SearchCache:
+    """
+    LRU + TTL cache of search pages, bounded by an approximate byte budget.
+    Keys carry a per-collection generation number; writes bump the
+    generation so affected entries simply stop matching and age out.
+    """
+
+    def __init__(self, ttl, max_bytes):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+        self._data = OrderedDict()  # key -> (expires_at, size, value)
+        self._gen = {name: 0 for name in COLLECTIONS}
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_bytes > 0
+
+    def key(self, query, collection_type, offset, max_results, lang=None, quality=None):
+        if collection_type in self._gen:
+            gen = (self._gen[collection_type],)
+        else:
+            gen = tuple(self._gen.values())
+        return (query, collection_type, offset, max_results, lang, quality, gen)
+
+    @staticmethod
+    def _sizeof(value):
+        docs = value[0]
+        return 200 + sum(
+            120 + len(d.get("file_name", "")) + len(d.get("caption", "") or "")
+            for d in docs
+        )
+
+    def get(self, key):
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        expires, size, value = item
+        if expires < time.monotonic():
+            del self._data[key]
+            self.size -= size
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        old = self._data.pop(key, None)
+        if old:
+            self.size -= old[1]
+        size = self._sizeof(value)
+        self._data[key] = (time.monotonic() + self.ttl, size, value)
+        self.size += size
+        while self.size > self.max_bytes and self._data:
+            _, (_, s, _) = self._data.popitem(last=False)
+            self.size -= s
+            self.evictions += 1
+
+    def invalidate(self, collection_type="all"):
+        """Bump generation so cached pages of this collection miss"""
+        for name in self._gen:
+            if collection_type in ("all", name):
+                self._gen[name] += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "size": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "coalesced": self.coalesced,
+            "hit_rate": round(self.hits * 100 / lookups, 1) if lookups else 0.0
+        }
+
+search_cache = SearchCache(CACHE_TIME, SEARCH_CACHE_MB * 1024 * 1024)
+
+# In-flight searches, keyed like the cache (single-flight coalescing)
+_inflight = {}
+
+class FileCache:
+    """Small LRU of file docs by _id — popular files skip Mongo entirely"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, file_id):
+        doc = self._data.get(file_id)
+        if doc is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(file_id)
+        self.hits += 1
+        return doc
+
+    def put(self, file_id, doc):
+        if self.max_entries <= 0:
+            return
+        self._data[file_id] = doc
+        self._data.move_to_end(file_id)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def discard(self, file_ids):
+        for file_id in file_ids:
+            self._data.pop(file_id, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "hit_rate": round(self.hits * 100 / lookups, 1) if lookups else 0.0
+        }
+
+file_cache = FileCache(FILE_CACHE_SIZE)
+
+# ─────────────────────────────────────────
+# 🧠 IN-MEMORY TITLE INDEX (OPTIONAL)
+# ─────────────────────────────────────────
+title_index = TitleIndex(COLLECTIONS) if MEMORY_INDEX else None
+
+# "Did you mean" dictionary (SymSpell) — catalog title tokens से
+spell = SymSpell(SPELL_MAX_EDIT, min_count=SPELL_MIN_COUNT) if SPELL_CHECK else None
+
+def _tokens(text):
+    return normalize_query(text or "").split()
+
+async def load_search_indexes(batch_size=5000):
+    """One pass over all collections to fill the RAM title index and spell dictionary"""
+    if title_index is None and spell is None:
+        return
+    for name, col in COLLECTIONS.items():
+        loaded = 0
+        cursor = col.find(
+            {}, {"file_name": 1, "file_size": 1, F_LANG: 1, F_QUALITY: 1}
+        ).batch_size(batch_size)
+        async for doc in cursor:
+            f_name = doc.get("file_name", "")
+            tokens = _tokens(f_name)
+            if title_index is not None:
+                title_index.add(
+                    name, doc["_id"], f_name, doc.get("file_size", 0), tokens, doc_tag_bits(doc)
+                )
+            if spell is not None:
+                spell.add_text(tokens)
+            loaded += 1
+        logger.info(f"🧠 Search indexes: {loaded} files loaded from {name}")
+    if title_index is not None:
+        title_index.ready = True
+        logger.info(f"🧠 Title index ready ({title_index.memory_usage() // (1024 * 1024)} MB)")
+    if spell is not None:
+        logger.info(f"🔤 Spell dictionary ready ({len(spell)} words)")
+
+def spell_suggestions(query, count=3):
+    """Corrected queries for a search that found nothing"""
+    if spell is None:
+        return []
+    return spell.suggest(_tokens(query), count)
+
+def _memory_search(query, max_results, offset, lang, collection_type, quality=None):
+    """Same cascade as _run_search, answered from the in-memory index"""
+    tokens = query.split()
+    mask = tag_mask(lang, quality)
+    if collection_type == "all":
+        names = list(COLLECTIONS)
+    elif collection_type in COLLECTIONS:
+        names = [collection_type]
+    else:
+        names = ["primary"]
+
+    results, total, actual_source = [], 0, collection_type
+    for name in names:
+        results, total = title_index.search(name, tokens, offset, max_results, mask, SEARCH_COUNT_CAP)
+        total = _capped_total(total)
+        if results:
+            actual_source = name
+            break
+    # Trigram fallback (default collection path has none, same as Mongo)
+    if not results and (collection_type == "all" or collection_type in COLLECTIONS):
+        results, total, sources = title_index.fuzzy_search(
+            names, tokens, offset, max_results, FUZZY_MIN_SCORE, mask
+        )
+        if results:
+            actual_source = sources.pop() if len(sources) == 1 else "all"
+
+    next_offset = offset + max_results
+    if next_offset >= total:
+        # Capped total: full page means there may be more
+        if not (is_count_capped(total) and len(results) == max_results):
+            next_offset = ""
+    return results, next_offset, total, actual_source
 
 # ─────────────────────────────────────────
 # 📊 DB STATS (ASYNC)
@@ -86,23 +381,56 @@ async def db_count_documents():
 # ─────────────────────────────────────────
 # 💾 SAVE FILE (ASYNC)
 # ─────────────────────────────────────────
+def build_file_doc(media):
+    """Mongo document for one Telegram media object"""
+    file_id = unpack_new_file_id(media.file_id)
+
+    # क्लीन नाम और कैप्शन
+    f_name = re.sub(r"@\w+", "", media.file_name or "").strip()
+    caption = re.sub(r"@\w+", "", media.caption or "").strip()
+
+    doc = {
+        "_id": file_id,
+        "file_name": f_name,
+        "file_size": media.file_size,
+        **derived_fields(f_name, caption, media.file_size)
+    }
+    # Caption सिर्फ तब store होता है जब search उसमें भी देखे (tags ऊपर निकल चुके)
+    if USE_CAPTION_FILTER:
+        doc["caption"] = caption
+    return doc
+
+def _after_insert(col_name, docs):
+    """Keep cache / RAM index / spell dictionary in sync with new docs"""
+    if not docs:
+        return
+    search_cache.invalidate(col_name)
+    for doc in docs:
+        tokens = _tokens(doc["file_name"])
+        if title_index is not None:
+            title_index.add(col_name, doc["_id"], doc["file_name"], doc["file_size"], tokens, doc_tag_bits(doc))
+        if spell is not None:
+            spell.add_text(tokens)
+
+async def known_fingerprints(fps):
+    """Fingerprints already stored in any collection (one indexed query each)"""
+    if not fps:
+        return set()
+    fps = list(fps)
+    found = await asyncio.gather(*(
+        col.distinct(F_FP, {F_FP: {"$in": fps}}) for col in COLLECTIONS.values()
+    ))
+    return set().union(*found)
+
 async def save_file(media, collection_type="primary"):
     try:
-        file_id = unpack_new_file_id(media.file_id)
-        
-        # क्लीन नाम और कैप्शन
-        f_name = re.sub(r"@\w+", "", media.file_name or "").strip()
-        caption = re.sub(r"@\w+", "", media.caption or "").strip()
-
-        doc = {
-            "_id": file_id,
-            "file_name": f_name,
-            "caption": caption,
-            "file_size": media.file_size
-        }
-
+        doc = build_file_doc(media)
+        if CROSS_DEDUPE and await known_fingerprints([doc[F_FP]]):
+            return "dup"
         col = COLLECTIONS.get(collection_type, primary)
         await col.insert_one(doc)
+        col_name = collection_type if collection_type in COLLECTIONS else "primary"
+        _after_insert(col_name, [doc])
         return "suc"
     except DuplicateKeyError:
         return "dup"
@@ -110,153 +438,670 @@ async def save_file(media, collection_type="primary"):
         logger.error(f"Error saving file: {e}")
         return "err"
 
+async def save_files(docs, collection_type="primary"):
+    """
+    Unordered bulk insert: one round trip per batch, duplicates don't stop
+    the rest. Returns (inserted, duplicate, errors).
+    """
+    if not docs:
+        return 0, 0, 0
+    col = COLLECTIONS.get(collection_type, primary)
+    col_name = collection_type if collection_type in COLLECTIONS else "primary"
+    failed = set()
+    duplicate = errors = 0
+    if CROSS_DEDUPE:
+        # Primary/Cloud/Archive में कहीं भी पहले से है → insert ही मत करो
+        try:
+            known = await known_fingerprints({doc[F_FP] for doc in docs})
+        except Exception as e:
+            logger.error(f"Fingerprint check failed: {e}")
+            known = set()
+        fresh = []
+        for doc in docs:
+            if doc[F_FP] in known:
+                duplicate += 1
+            else:
+                known.add(doc[F_FP])
+                fresh.append(doc)
+        docs = fresh
+        if not docs:
+            return 0, duplicate, 0
+    try:
+        await col.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        for err in e.details.get("writeErrors", []):
+            failed.add(err["index"])
+            if err.get("code") == 11000:
+                duplicate += 1
+            else:
+                errors += 1
+        if errors:
+            logger.error(f"Bulk save: {errors} write errors in {col_name}")
+    except Exception as e:
+        logger.error(f"Error bulk saving files: {e}")
+        return 0, duplicate, len(docs)
+    saved = [doc for i, doc in enumerate(docs) if i not in failed]
+    _after_insert(col_name, saved)
+    return len(saved), duplicate, errors
+
+class BulkSaver:
+    """
+    Buffers file docs for one collection and writes them with save_files
+    every `batch_size` docs or `flush_ms` after the first buffered doc,
+    whichever comes first. Counters are cumulative over the saver's life.
+    """
+
+    def __init__(self, collection_type="primary", batch_size=INDEX_BATCH_SIZE, flush_ms=INDEX_FLUSH_MS):
+        self.collection_type = collection_type
+        self.batch_size = max(batch_size, 1)
+        self.flush_ms = flush_ms
+        self.inserted = 0
+        self.duplicate = 0
+        self.errors = 0
+        self.batches = 0
+        self.last_latency = 0.0     # seconds, last insert_many round trip
+        self.write_time = 0.0       # seconds, all batches (avg = write_time / batches)
+        self._buf = []
+        self._timer = None
+        self._writes = set()        # insert_many calls in flight
+
+    async def add(self, media):
+        try:
+            self._buf.append(build_file_doc(media))
+        except Exception as e:
+            logger.error(f"Error building file doc: {e}")
+            self.errors += 1
+            return
+        if len(self._buf) >= self.batch_size:
+            await self.flush()
+        elif self._timer is None and self.flush_ms > 0:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_ms / 1000)
+        self._timer = None
+        await self._write()
+
+    async def flush(self):
+        """Write whatever is buffered and wait for every write in flight"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self._write()
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+    async def _write(self):
+        docs, self._buf = self._buf, []
+        if not docs:
+            return
+        start = time.perf_counter()
+        task = asyncio.ensure_future(save_files(docs, self.collection_type))
+        self._writes.add(task)
+        try:
+            inserted, duplicate, errors = await task
+        finally:
+            self._writes.discard(task)
+        self.last_latency = time.perf_counter() - start
+        self.write_time += self.last_latency
+        self.batches += 1
+        self.inserted += inserted
+        self.duplicate += duplicate
+        self.errors += errors
+
+# ─────────────────────────────────────────
+# 🧩 BACKFILL DERIVED FIELDS (OLD DOCS)
+# ─────────────────────────────────────────
+def _stale_filter():
+    """Docs that still need a (re)write by backfill_fields"""
+    stale = [{F_VER: {"$ne": DERIVED_VERSION}}]
+    if not USE_CAPTION_FILTER:
+        stale.append({"caption": {"$exists": True}})
+    return {"$or": stale} if len(stale) > 1 else stale[0]
+
+async def backfill_fields(collection_type="all", batch_size=1000, progress=None):
+    """
+    Online migration: (re)compute derived fields for docs saved by an older
+    DERIVED_VERSION or the other naming scheme, drop the other scheme's
+    fields (and caption when USE_CAPTION_FILTER is off) in bulk batches,
+    pausing MIGRATE_PAUSE_MS between batches. The other scheme's indexes go
+    once a collection is clean.
+    `progress(collection, updated_so_far)` is awaited per batch.
+    """
+    updated = 0
+    unset = dict.fromkeys(OTHER_FIELDS, "")
+    if not USE_CAPTION_FILTER:
+        unset["caption"] = ""
+    for name, col in COLLECTIONS.items():
+        if collection_type not in ("all", name): continue
+        ops = []
+        tags = []                   # (file_id, tag bits) → RAM index, नहीं तो filters restart तक miss
+        cursor = col.find(_stale_filter(), {"file_name": 1, "caption": 1, "file_size": 1})
+        async for doc in cursor:
+            fields = derived_fields(doc.get("file_name", ""), doc.get("caption", ""), doc.get("file_size", 0))
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": fields, "$unset": unset}))
+            tags.append((doc["_id"], doc_tag_bits(fields)))
+            if len(ops) >= batch_size:
+                await col.bulk_write(ops, ordered=False)
+                updated += len(ops)
+                if title_index is not None:
+                    title_index.set_tags(name, tags)
+                ops, tags = [], []
+                search_cache.invalidate(name)
+                if progress is not None:
+                    await progress(name, updated)
+                await asyncio.sleep(MIGRATE_PAUSE_MS / 1000)
+        if ops:
+            await col.bulk_write(ops, ordered=False)
+            updated += len(ops)
+            if title_index is not None:
+                title_index.set_tags(name, tags)
+        search_cache.invalidate(name)
+        file_cache.clear()
+        if not await col.count_documents(_stale_filter(), limit=1):
+            for field in OTHER_FIELDS[:-1]:
+                try:
+                    await col.drop_index(f"{name}_{field}")
+                except Exception:
+                    pass    # already gone / never created
+        logger.info(f"🧩 Backfilled {name}")
+    return updated
+
 # ─────────────────────────────────────────
 # 🔍 ULTRA FAST SEARCH CORE (ASYNC)
 # ─────────────────────────────────────────
-def _text_filter(q):
-    return {"$text": {"$search": q}}
+def _text_filter(q, tag_filter=None):
+    return {"$text": {"$search": q}, **(tag_filter or {})}
 
-async def _search(col, q, offset, limit):
+def _tag_filter(lang=None, quality=None, year=None):
+    """Indexed tag predicates — filtering happens in the query, not after it"""
+    flt = {}
+    if year:
+        flt[F_YEAR] = year
+    if lang:
+        flt[F_LANG] = lang.lower()
+    if quality:
+        flt[F_QUALITY] = quality.lower()
+    return flt
+
+# Only what result pages render — caption stays on disk for delivery
+SEARCH_PROJECTION = {
+    "file_name": 1,
+    "file_size": 1,
+    "score": 1
+}
+# Fuzzy pages can mix collections → every doc keeps its own source (deep link hint)
+FUZZY_PROJECTION = {**SEARCH_PROJECTION, "src": 1}
+
+async def _search_find(col, q, offset, limit, tag_filter=None, max_time_ms=None):
     try:
         # Motor cursor usage
         cursor = col.find(
-            _text_filter(q),
-            {
-                "file_name": 1,
-                "file_size": 1,
-                "caption": 1,
-                "score": {"$meta": "textScore"}
-            }
+            _text_filter(q, tag_filter),
+            {**SEARCH_PROJECTION, "score": {"$meta": "textScore"}}
         )
         cursor.sort([("score", {"$meta": "textScore"})])
-        cursor.skip(offset).limit(limit)
+        cursor.skip(offset).limit(limit).max_time_ms(max_time_ms)
         
         docs = await cursor.to_list(length=limit)
-        count = await col.count_documents(_text_filter(q))
-        return docs, count
+        opts = {"maxTimeMS": max_time_ms} if max_time_ms else {}
+        if SEARCH_COUNT_CAP:
+            # बहुत broad queries ("movie", "2023") के लिए गिनती यहीं रोक दो
+            opts["limit"] = SEARCH_COUNT_CAP
+        count = await col.count_documents(_text_filter(q, tag_filter), **opts)
+        return docs, _capped_total(count)
+    except Exception as e:
+        logger.error(f"Search error: {e}")
+        return None, 0              # None = lookup failed (not "no hits")
+
+def _after_cursor(cursor):
+    """Keyset filter: docs that sort after (score, _id) in (score desc, _id asc)"""
+    score, last_id = cursor
+    return {"$or": [
+        {"score": {"$lt": score}},
+        {"score": score, "_id": {"$gt": last_id}}
+    ]}
+
+def _page_stages(offset, limit, cursor=None, projection=SEARCH_PROJECTION):
+    """Sorted page of a scored result set (needs a `score` field)"""
+    # Cursor मिला तो skip की जगह (score, _id) से आगे बढ़ो — deep pages भी सस्ते
+    if cursor:
+        stages = [{"$match": _after_cursor(cursor)}, {"$sort": {"score": -1, "_id": 1}}]
+    else:
+        stages = [{"$sort": {"score": -1, "_id": 1}}, {"$skip": offset}]
+    return stages + [{"$limit": limit}, {"$project": projection}]
+
+class CappedCount(int):
+    """A total whose counting stopped at SEARCH_COUNT_CAP"""
+
+def _capped_total(n):
+    """int → CappedCount when counting reached SEARCH_COUNT_CAP"""
+    return CappedCount(n) if SEARCH_COUNT_CAP and n >= SEARCH_COUNT_CAP else n
+
+def _facet_total(total):
+    """`total` facet output → int (always exact: the page branch scans everything anyway)"""
+    return total[0]["n"] if total else 0
+
+async def _search_facet(col, q, offset, limit, cursor=None, tag_filter=None, max_time_ms=None):
+    """Page + total in a single aggregation (one $text scan)"""
+    pipeline = [
+        {"$match": _text_filter(q, tag_filter)},
+        {"$addFields": {"score": {"$meta": "textScore"}}},
+        {"$facet": {
+            "docs": _page_stages(offset, limit, cursor),
+            "total": [{"$count": "n"}]
+        }}
+    ]
+    try:
+        opts = {"maxTimeMS": max_time_ms} if max_time_ms else {}
+        res = await col.aggregate(pipeline, **opts).to_list(length=1)
+        if not res:
+            return [], 0
+        return res[0]["docs"], _facet_total(res[0]["total"])
     except Exception as e:
         logger.error(f"Search error: {e}")
-        return [], 0
+        return None, 0              # None = lookup failed (not "no hits")
+
+async def _search(col, q, offset, limit, cursor=None, tag_filter=None, max_time_ms=None):
+    """`max_time_ms`: server-side limit, only for speculative (fan-out) lookups"""
+    if SEARCH_FACET:
+        return await _search_facet(col, q, offset, limit, cursor, tag_filter, max_time_ms)
+    # find() textScore पर filter नहीं कर सकता, इसलिए यहाँ skip ही चलेगा
+    return await _search_find(col, q, offset, limit, tag_filter, max_time_ms)
+
+def page_cursor(files):
+    """Keyset cursor after the last file of a result page"""
+    last = files[-1]
+    return (last.get("score"), last["_id"])
+
+def is_count_capped(total):
+    """
+    True if the total hit SEARCH_COUNT_CAP (real count may be higher). Only
+    find() counts and capped RAM index scans are marked — $facet totals are exact.
+    """
+    return isinstance(total, CappedCount)
+
+def format_count(total, per_page=1):
+    """Human count for UI: "84" or "1000+" when capped"""
+    n = math.ceil(total / per_page)
+    return f"{n}+" if is_count_capped(total) else str(n)
+
+def _fuzzy_branch(name, qgrams, tag_filter=None):
+    return [
+        {"$match": {F_GRAMS: {"$in": qgrams}, **(tag_filter or {})}},
+        {"$project": {
+            "file_name": 1,
+            "file_size": 1,
+            "score": {"$divide": [
+                {"$size": {"$setIntersection": [f"${F_GRAMS}", qgrams]}},
+                len(qgrams)
+            ]}
+        }},
+        {"$match": {"score": {"$gte": FUZZY_MIN_SCORE}}},
+        {"$addFields": {"src": name}}
+    ]
+
+async def _fuzzy_search(query, names, offset, limit, cursor=None, tag_filter=None):
+    """
+    Trigram fallback for typos ("avangers") and partial words ("spiderm").
+    All requested collections are ranked by gram overlap in ONE aggregation
+    ($unionWith). Source is "all" when hits span several collections.
+    """
+    qgrams = make_grams(query.split())
+    if not qgrams:
+        return [], 0, None
+
+    pipeline = _fuzzy_branch(names[0], qgrams, tag_filter)
+    for name in names[1:]:
+        pipeline.append({"$unionWith": {
+            "coll": COLLECTIONS[name].name,
+            "pipeline": _fuzzy_branch(name, qgrams, tag_filter)
+        }})
+    pipeline.append({"$facet": {
+        "docs": _page_stages(offset, limit, cursor, FUZZY_PROJECTION),
+        "total": [{"$count": "n"}],
+        "srcs": [{"$group": {"_id": "$src"}}]
+    }})
+    try:
+        res = await COLLECTIONS[names[0]].aggregate(pipeline).to_list(length=1)
+        if not res or not res[0]["docs"]:
+            return [], 0, None
+        srcs = [d["_id"] for d in res[0]["srcs"]]
+        source = srcs[0] if len(srcs) == 1 else "all"
+        return res[0]["docs"], _facet_total(res[0]["total"]), source
+    except Exception as e:
+        logger.error(f"Fuzzy search error: {e}")
+        return None, 0, None
+
+async def _fanout_search(query, offset, limit, cursor=None, tag_filter=None, fuzzy=True):
+    """
+    Query all collections concurrently. Results are still picked in
+    cascade priority order; once a higher-priority lookup has hits, the
+    slower ones are cancelled. Only those speculative lower-priority
+    lookups carry SEARCH_TIMEOUT_MS (so a cancelled one stops on the
+    server too); if one timed out and turns out to be needed, it is rerun
+    without a limit. The trigram fallback is heavy, so it runs only when
+    every exact lookup came back empty (and `fuzzy` is set).
+    Returns (docs, total, source, failed).
+    """
+    names = list(COLLECTIONS)
+    tasks = [
+        asyncio.create_task(_search(
+            COLLECTIONS[name], query, offset, limit, cursor, tag_filter,
+            None if i == 0 else SEARCH_TIMEOUT_MS
+        ))
+        for i, name in enumerate(names)
+    ]
+    failed = False
+    try:
+        for i, (name, task) in enumerate(zip(names, tasks)):
+            docs, cnt = await task
+            if docs is None and i:
+                # Speculative lookup timed out / errored, अब इसी की बारी है → पूरा चलाओ
+                docs, cnt = await _search(COLLECTIONS[name], query, offset, limit, cursor, tag_filter)
+            if docs:
+                return docs, cnt, name, False
+            failed = failed or docs is None
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+    if not fuzzy:
+        return [], 0, None, failed
+    docs, cnt, src = await _fuzzy_search(query, names, offset, limit, cursor, tag_filter)
+    return docs, cnt, src, failed or docs is None
 
 # ─────────────────────────────────────────
 # 🚀 PUBLIC SEARCH API (ASYNC CASCADE)
 # ─────────────────────────────────────────
-async def get_search_results(query, max_results=MAX_BTN, offset=0, lang=None, collection_type="primary"):
+async def get_search_results(query, max_results=MAX_BTN, offset=0, lang=None, collection_type="primary", cursor=None, quality=None):
+    """
+    `cursor` is the (score, _id) of the last file on the previous page
+    (see `page_cursor`). When given, the page starting at `offset` is
+    fetched by keyset instead of skip; `offset` is still used for counts.
+    `lang` / `quality` filter on the tags stored by save_file. A year in
+    the query ("avengers 2019") becomes an indexed filter on the stored
+    year tag instead of a text term (normalization would mangle it anyway).
+    """
     if not query or not query.strip():
         return [], "", 0, collection_type
     
+    text, year = split_year(query)
     query = normalize_query(query)
     if not query:
         return [], "", 0, collection_type
-    
-    prefix = prefix_query(query)
+
+    key = search_cache.key(query, collection_type, offset, max_results, lang, quality)
+    cached = search_cache.get(key)
+    if cached is not None:
+        return cached
+
+    # 🧠 RAM index loaded? Mongo तक जाने की जरूरत नहीं
+    if title_index is not None and title_index.ready:
+        res = _memory_search(query, max_results, offset, lang, collection_type, quality)
+        search_cache.put(key, res)
+        return res
+
+    # ⚡ Single-flight: same query already running? उसी का result share करो
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(
+            _search_and_cache(key, normalize_query(text), max_results, offset, lang, collection_type, cursor, quality, year)
+        )
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    else:
+        search_cache.coalesced += 1
+    # shield: एक caller cancel हो तो बाकी के लिए search न रुके
+    return await asyncio.shield(task)
+
+async def _search_and_cache(key, *args):
+    res, failed = await _run_search(*args)
+    # Mongo error / timeout वाला (खाली) result cache नहीं होता — अगली बार फिर try
+    if not failed:
+        search_cache.put(key, res)
+    return res
+
+async def _run_search(query, max_results, offset, lang, collection_type, cursor=None, quality=None, year=None):
+    """(results, next_offset, total, source), failed — failed = some lookup errored"""
+    if year:
+        # Year pass सिर्फ exact lookups — fuzzy नीचे वाले pass में एक ही बार चलेगा
+        res, failed = await _run_cascade(
+            query, max_results, offset, collection_type, cursor, _tag_filter(lang, quality, year), fuzzy=False
+        )
+        if res[2] or failed:
+            return res, failed
+        # किसी file के नाम में यह year नहीं → बिना year filter के (हर page पर same)
+    return await _run_cascade(query, max_results, offset, collection_type, cursor, _tag_filter(lang, quality))
+
+async def _run_cascade(query, max_results, offset, collection_type, cursor, tags, fuzzy=True):
     results = []
     total = 0
     actual_source = collection_type
+    failed = False                  # any lookup errored → caller won't cache a miss
+
+    # ⚡ FAN-OUT SEARCH: Primary, Cloud, Archive (+ fuzzy) एक साथ
+    if collection_type == "all" and SEARCH_FANOUT:
+        docs, cnt, src, failed = await _fanout_search(query, offset, max_results, cursor, tags, fuzzy)
+        if docs:
+            results.extend(docs)
+            total = cnt
+            actual_source = src
 
     # ⚡ ASYNC CASCADE SEARCH: Primary → Cloud → Archive
-    if collection_type == "all":
+    elif collection_type == "all":
         # 1. Primary
-        docs, cnt = await _search(primary, query, offset, max_results)
+        docs, cnt = await _search(primary, query, offset, max_results, cursor, tags)
+        failed = failed or docs is None
         if docs:
             results.extend(docs)
-            total += cnt
+            total = cnt
             actual_source = "primary"
         
         # 2. Cloud (If primary failed)
         if not results:
-            docs, cnt = await _search(cloud, query, offset, max_results)
+            docs, cnt = await _search(cloud, query, offset, max_results, cursor, tags)
+            failed = failed or docs is None
             if docs:
                 results.extend(docs)
-                total += cnt
+                total = cnt
                 actual_source = "cloud"
             
             # 3. Archive (If cloud failed)
             if not results:
-                docs, cnt = await _search(archive, query, offset, max_results)
+                docs, cnt = await _search(archive, query, offset, max_results, cursor, tags)
+                failed = failed or docs is None
                 if docs:
                     results.extend(docs)
-                    total += cnt
+                    total = cnt
                     actual_source = "archive"
                 
-                # 4. Fallback (Prefix Search)
-                if not results and prefix:
-                    for col_name, col in [("primary", primary), ("cloud", cloud), ("archive", archive)]:
-                        docs, cnt = await _search(col, prefix, 0, max_results)
-                        if docs:
-                            results.extend(docs)
-                            total += cnt
-                            actual_source = col_name
-                            break
+                # 4. Fallback (Trigram Search, all collections in one query)
+                if not results and fuzzy:
+                    docs, cnt, src = await _fuzzy_search(
+                        query, list(COLLECTIONS), offset, max_results, cursor, tags
+                    )
+                    failed = failed or docs is None
+                    if docs:
+                        results.extend(docs)
+                        total = cnt
+                        actual_source = src
 
     # Single Collection Search
     elif collection_type in COLLECTIONS:
         col = COLLECTIONS[collection_type]
-        docs, cnt = await _search(col, query, offset, max_results)
-        results.extend(docs)
-        total += cnt
+        docs, cnt = await _search(col, query, offset, max_results, cursor, tags)
+        failed = failed or docs is None
+        results.extend(docs or [])
+        total = cnt
         
-        if not results and prefix:
-            docs, cnt = await _search(col, prefix, 0, max_results)
-            results.extend(docs)
-            total += cnt
+        if not results and fuzzy:
+            docs, cnt, _ = await _fuzzy_search(query, [collection_type], offset, max_results, cursor, tags)
+            failed = failed or docs is None
+            results.extend(docs or [])
+            total = cnt
             
     else:
         # Default fallback
-        docs, cnt = await _search(primary, query, offset, max_results)
-        results.extend(docs)
-        total += cnt
-
-    # 5. Language Filter
-    if lang and results:
-        lang = lang.lower()
-        results = [f for f in results if lang in f["file_name"].lower()]
-        total = len(results)
+        docs, cnt = await _search(primary, query, offset, max_results, cursor, tags)
+        failed = failed or docs is None
+        results.extend(docs or [])
+        total = cnt
 
     next_offset = offset + max_results
     if next_offset >= total:
-        next_offset = ""
+        # Capped total: full page means there may be more
+        if not (is_count_capped(total) and len(results) == max_results):
+            next_offset = ""
 
-    return results, next_offset, total, actual_source
+    return (results, next_offset, total, actual_source), failed
 
 # ─────────────────────────────────────────
 # 🗑 DELETE FILES (ASYNC)
 # ─────────────────────────────────────────
-async def delete_files(query, collection_type="all"):
+def _delete_filter(query):
+    """"*" = everything, else the same $text match search uses; None = nothing"""
+    if query == "*":
+        return {}
+    query = normalize_query(query)
+    return _text_filter(query) if query else None
+
+async def count_files(query, collection_type="all"):
+    """Dry run for delete_files: {collection: matching docs}"""
+    flt = _delete_filter(query)
+    counts = {}
+    if flt is None:
+        return counts
+    for name, col in COLLECTIONS.items():
+        if collection_type not in ("all", name): continue
+        counts[name] = await (col.count_documents(flt) if flt else col.estimated_document_count())
+    return counts
+
+async def delete_files(query, collection_type="all", progress=None, batch_size=DELETE_BATCH_SIZE):
+    """
+    Chunked delete: matching _ids are fetched and deleted DELETE_BATCH_SIZE
+    at a time, pausing DELETE_PAUSE_MS between batches so searches keep
+    flowing. `progress(collection, deleted_so_far)` is awaited per batch.
+    An interrupted run is resumed by simply running it again.
+    """
+    flt = _delete_filter(query)
+    if flt is None:
+        return 0
     deleted = 0
     try:
-        if query == "*":
-            for name, col in COLLECTIONS.items():
-                if collection_type != "all" and name != collection_type: continue
-                res = await col.delete_many({})
-                deleted += res.deleted_count
-            return deleted
-        
-        query = normalize_query(query)
-        if not query: return 0
-        
-        flt = _text_filter(query)
         for name, col in COLLECTIONS.items():
-            if collection_type != "all" and name != collection_type: continue
-            res = await col.delete_many(flt)
-            deleted += res.deleted_count
-            if res.deleted_count > 0:
-                logger.info(f"🗑️ Deleted {res.deleted_count} from {name}")
-
+            if collection_type not in ("all", name): continue
+            before = deleted
+            while True:
+                ids = [d["_id"] async for d in col.find(flt, {"_id": 1}).limit(batch_size)]
+                if not ids:
+                    break
+                removed = await delete_file_ids(ids, name)
+                if not removed:
+                    break
+                deleted += removed
+                if progress is not None:
+                    await progress(name, deleted)
+                await asyncio.sleep(DELETE_PAUSE_MS / 1000)
+            if query == "*" and title_index is not None:
+                title_index.clear(name)
+            if deleted > before:
+                logger.info(f"🗑️ Deleted {deleted - before} from {name}")
         return deleted
     except Exception as e:
         logger.error(f"Error deleting: {e}")
+        search_cache.invalidate(collection_type)
         return deleted
 
+async def delete_file_ids(ids, collection_type):
+    """Bulk delete by _id from one collection (reconcile / dedupe)"""
+    if not ids:
+        return 0
+    col = COLLECTIONS[collection_type]
+    res = await col.delete_many({"_id": {"$in": list(ids)}})
+    file_cache.discard(ids)
+    if title_index is not None:
+        title_index.remove(collection_type, ids)
+    if res.deleted_count:
+        search_cache.invalidate(collection_type)
+    return res.deleted_count
+
+async def find_duplicates():
+    """Yield [{"id", "src"}] for every fingerprint stored more than once (all collections)"""
+    def branch(name):
+        return [{"$match": {F_FP: {"$exists": True}}}, {"$project": {F_FP: 1, "src": {"$literal": name}}}]
+
+    first, *rest = COLLECTIONS
+    pipeline = branch(first)
+    for name in rest:
+        pipeline.append({"$unionWith": {"coll": COLLECTIONS[name].name, "pipeline": branch(name)}})
+    pipeline += [
+        {"$group": {"_id": f"${F_FP}", "docs": {"$push": {"id": "$_id", "src": "$src"}}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}}
+    ]
+    async for group in COLLECTIONS[first].aggregate(pipeline, allowDiskUse=True):
+        yield group["docs"]
+
+async def dedupe_files(dry_run=False, batch_size=500):
+    """
+    Keep one copy per fingerprint — the one in the highest-priority
+    collection (primary > cloud > archive) — and bulk-delete the rest.
+    Returns (duplicate groups, {collection: removed}).
+    """
+    rank = {name: i for i, name in enumerate(COLLECTIONS)}
+    doomed = {name: [] for name in COLLECTIONS}
+    removed = {name: 0 for name in COLLECTIONS}
+    groups = 0
+
+    async def drop(name):
+        ids, doomed[name] = doomed[name], []
+        removed[name] += len(ids) if dry_run else await delete_file_ids(ids, name)
+
+    async for docs in find_duplicates():
+        groups += 1
+        docs.sort(key=lambda d: (rank[d["src"]], d["id"]))
+        for d in docs[1:]:
+            doomed[d["src"]].append(d["id"])
+            if len(doomed[d["src"]]) >= batch_size:
+                await drop(d["src"])
+    for name in COLLECTIONS:
+        await drop(name)
+    return groups, removed
+
+async def iter_file_batches(collection_type, batch_size=500, after=None, projection=None):
+    """Walk one collection in _id order (keyset, no skip); yields lists of docs"""
+    col = COLLECTIONS[collection_type]
+    projection = projection or {"file_name": 1}
+    while True:
+        flt = {"_id": {"$gt": after}} if after is not None else {}
+        batch = await col.find(flt, projection).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            return
+        yield batch
+        after = batch[-1]["_id"]
+
 # ─────────────────────────────────────────
 # 📂 FILE DETAILS & UTILS (ASYNC)
 # ─────────────────────────────────────────
-async def get_file_details(file_id):
+async def get_file_details(file_id, collection_type=None):
+    """
+    `collection_type` (from the deep link) → one indexed lookup.
+    Old links without a hint fall back to probing in priority order.
+    """
+    doc = file_cache.get(file_id)
+    if doc is not None:
+        return doc
     try:
-        for col in COLLECTIONS.values():
-            doc = await col.find_one({"_id": file_id})
-            if doc: return doc
-        return None
+        if collection_type in COLLECTIONS:
+            doc = await COLLECTIONS[collection_type].find_one({"_id": file_id})
+        if doc is None:
+            for name, col in COLLECTIONS.items():
+                if name == collection_type: continue
+                doc = await col.find_one({"_id": file_id})
+                if doc: break
+        if doc:
+            file_cache.put(file_id, doc)
+        return doc
     except Exception:
         return None
 
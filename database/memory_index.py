@@ -0,0 +1,313 @@
+import sys
+import heapq
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+# ─────────────────────────────────────────
+# 🧠 IN-MEMORY TITLE INDEX (COMPACT)
+# ─────────────────────────────────────────
+# हर collection का एक shard: docs सिर्फ parallel arrays/lists में,
+# कोई per-document dict नहीं। Tokens पूरे index में एक बार intern होते हैं,
+# posting lists doc numbers के sorted array('I') हैं।
+
+SCAN_CHUNK = 4096   # capped search: shortest posting list इतने docnos के टुकड़ों में
+
+
+def word_grams(word):
+    """Trigrams of one word, padded so prefixes/suffixes count: " av", "ave"..."""
+    w = f" {word} "
+    return {w[i:i + 3] for i in range(len(w) - 2)}
+
+
+def make_grams(tokens):
+    """Sorted trigram set of a title / query (already normalized tokens)"""
+    grams = set()
+    for tok in tokens:
+        grams |= word_grams(tok)
+    return sorted(grams)
+
+
+class _Shard:
+    __slots__ = ("ids", "names", "sizes", "lens", "tags", "alive", "pos", "postings", "live", "dead")
+
+    def __init__(self):
+        self.ids = []               # docno -> file _id
+        self.names = []             # docno -> file_name
+        self.sizes = array("q")     # docno -> file_size
+        self.lens = array("B")      # docno -> token count (ranking)
+        self.tags = array("L")      # docno -> language/quality bitmask
+        self.alive = bytearray()    # docno -> 1 / 0 (deleted)
+        self.pos = {}               # file _id -> docno
+        self.postings = {}          # token id -> array("I") of docnos
+        self.live = 0
+        self.dead = 0
+
+
+class TitleIndex:
+    """
+    Compact in-process search over file_name for every collection.
+    Callers pass already-normalized tokens; the index never talks to Mongo.
+    """
+
+    def __init__(self, collections):
+        self.shards = {name: _Shard() for name in collections}
+        self.vocab = {}             # token -> token id
+        self.tokens = []            # token id -> token
+        self.gram_tids = {}         # trigram -> array("I") of token ids
+        self.ready = False
+
+    # ───────── WRITE ─────────
+
+    def _tid(self, token):
+        tid = self.vocab.get(token)
+        if tid is None:
+            tid = self.vocab[token] = len(self.tokens)
+            self.tokens.append(sys.intern(token))
+            for gram in word_grams(token):
+                tids = self.gram_tids.get(gram)
+                if tids is None:
+                    tids = self.gram_tids[gram] = array("I")
+                tids.append(tid)
+        return tid
+
+    def add(self, collection, file_id, file_name, file_size, tokens, tags=0):
+        shard = self.shards[collection]
+        if file_id in shard.pos:
+            return False
+        docno = len(shard.ids)
+        shard.pos[file_id] = docno
+        shard.ids.append(file_id)
+        shard.names.append(file_name)
+        shard.sizes.append(file_size or 0)
+        shard.lens.append(min(len(tokens), 255) or 1)
+        shard.tags.append(tags)
+        shard.alive.append(1)
+        shard.live += 1
+        for tok in set(tokens):
+            tid = self._tid(tok)
+            plist = shard.postings.get(tid)
+            if plist is None:
+                plist = shard.postings[tid] = array("I")
+            plist.append(docno)
+        return True
+
+    def remove(self, collection, file_ids):
+        shard = self.shards[collection]
+        removed = 0
+        for file_id in file_ids:
+            docno = shard.pos.pop(file_id, None)
+            if docno is None:
+                continue
+            shard.alive[docno] = 0
+            shard.ids[docno] = ""
+            shard.names[docno] = ""
+            shard.live -= 1
+            shard.dead += 1
+            removed += 1
+        return removed
+
+    def set_tags(self, collection, items):
+        """Refresh tag bitmasks: items = [(file_id, tags)]"""
+        shard = self.shards[collection]
+        for file_id, tags in items:
+            docno = shard.pos.get(file_id)
+            if docno is not None:
+                shard.tags[docno] = tags
+
+    def clear(self, collection):
+        self.shards[collection] = _Shard()
+
+    # ───────── READ ─────────
+
+    def _similar_tids(self, word, min_score):
+        """Vocabulary tokens whose trigram Dice similarity to word >= min_score"""
+        qgrams = word_grams(word)
+        overlap = Counter()
+        for gram in qgrams:
+            overlap.update(self.gram_tids.get(gram, ()))
+        tokens = self.tokens
+        similar = {}
+        for tid, common in overlap.items():
+            score = 2 * common / (len(qgrams) + len(tokens[tid]))
+            if score >= min_score:
+                similar[tid] = score
+        return similar
+
+    def _postings(self, shard, tokens):
+        lists = []
+        for tok in set(tokens):
+            tid = self.vocab.get(tok)
+            plist = shard.postings.get(tid) if tid is not None else None
+            if not plist:
+                return []
+            lists.append(plist)
+        return lists
+
+    @staticmethod
+    def _intersect(lists):
+        lists.sort(key=len)
+        cand = lists[0]
+        for other in lists[1:]:
+            n = len(other)
+            if len(cand) * max(n.bit_length(), 1) > n:
+                members = set(other)
+                cand = [d for d in cand if d in members]
+            else:
+                cand = [
+                    d for d in cand
+                    if (i := bisect_left(other, d)) < n and other[i] == d
+                ]
+            if not cand:
+                break
+        return cand
+
+    def _filter(self, shard, hits, mask):
+        if shard.dead:
+            alive = shard.alive
+            hits = [d for d in hits if alive[d]]
+        if mask:
+            tags = shard.tags
+            hits = [d for d in hits if tags[d] & mask == mask]
+        return hits
+
+    def _capped_hits(self, shard, lists, mask, cap):
+        """
+        Matches in docno order, stopping once `cap` are found: the shortest
+        posting list is walked in chunks, each intersected with just the
+        matching slice of the other lists.
+        """
+        lists.sort(key=len)
+        first, rest = lists[0], lists[1:]
+        hits = []
+        for start in range(0, len(first), SCAN_CHUNK):
+            chunk = first[start:start + SCAN_CHUNK]
+            lo, hi = chunk[0], chunk[-1]
+            parts = [chunk]
+            for other in rest:
+                part = other[bisect_left(other, lo):bisect_right(other, hi)]
+                if not part:
+                    break
+                parts.append(part)
+            else:
+                hits.extend(self._filter(shard, self._intersect(parts), mask))
+                if len(hits) >= cap:
+                    return hits[:cap]
+        return hits
+
+    def search(self, collection, tokens, offset=0, limit=10, mask=0, cap=0):
+        """
+        AND-match tokens; shorter titles rank first. `mask`: required tag bits.
+        `cap` > 0 bounds the work on broad queries: scanning stops after about
+        `cap` matches (at least offset + limit), ranking happens among those
+        and the returned total is then just the cap (a lower bound).
+        """
+        shard = self.shards[collection]
+        if not tokens or not shard.live:
+            return [], 0
+        lists = self._postings(shard, tokens)
+        if not lists:
+            return [], 0
+
+        if cap:
+            hits = self._capped_hits(shard, lists, mask, max(cap, offset + limit))
+        else:
+            hits = self._filter(shard, self._intersect(lists), mask)
+        if not hits:
+            return [], 0
+
+        page = heapq.nsmallest(offset + limit, hits, key=shard.lens.__getitem__)[offset:]
+        nq = len(set(tokens))
+        docs = [
+            {
+                "_id": shard.ids[d],
+                "file_name": shard.names[d],
+                "file_size": shard.sizes[d],
+                "score": nq / shard.lens[d]
+            }
+            for d in page
+        ]
+        return docs, len(hits)
+
+    def fuzzy_search(self, collections, tokens, offset=0, limit=10, min_score=0.5, mask=0):
+        """
+        Typo / partial-word search across several shards in one pass.
+        Every query word must match some title token by trigram similarity;
+        a title scores the mean of its best per-word similarities.
+        Returns (docs, total, sources-with-hits).
+        """
+        words = set(tokens)
+        similar = [self._similar_tids(w, min_score) for w in words]
+        if not words or not all(similar):
+            return [], 0, set()
+
+        ranked = []
+        for rank, name in enumerate(collections):
+            shard = self.shards[name]
+            if not shard.live:
+                continue
+            best = None
+            for sims in similar:
+                word_best = {}
+                for tid, score in sims.items():
+                    for d in shard.postings.get(tid, ()):
+                        if score > word_best.get(d, 0):
+                            word_best[d] = score
+                if best is None:
+                    best = word_best
+                else:
+                    best = {d: s + word_best[d] for d, s in best.items() if d in word_best}
+                if not best:
+                    break
+            alive, tags = shard.alive, shard.tags
+            ranked.extend(
+                (-s / len(words), shard.lens[d], rank, d)
+                for d, s in best.items() if alive[d] and tags[d] & mask == mask
+            )
+
+        page = heapq.nsmallest(offset + limit, ranked)[offset:]
+        names = list(collections)
+        docs = []
+        for neg_score, _, rank, d in page:
+            shard = self.shards[names[rank]]
+            docs.append({
+                "_id": shard.ids[d],
+                "file_name": shard.names[d],
+                "file_size": shard.sizes[d],
+                "score": -neg_score,
+                "src": names[rank]
+            })
+        sources = {names[r] for _, _, r, _ in ranked}
+        return docs, len(ranked), sources
+
+    # ───────── STATS ─────────
+
+    @staticmethod
+    def _sample_size(items, sample=1000):
+        if not items:
+            return sys.getsizeof(items)
+        part = items[:sample]
+        avg = sum(sys.getsizeof(x) for x in part) / len(part)
+        return sys.getsizeof(items) + int(avg * len(items))
+
+    def memory_usage(self):
+        """Approximate bytes held by the index (strings are sampled)"""
+        total = sys.getsizeof(self.vocab) + self._sample_size(self.tokens)
+        total += sys.getsizeof(self.gram_tids)
+        total += sum(sys.getsizeof(t) for t in self.gram_tids.values())
+        for shard in self.shards.values():
+            total += self._sample_size(shard.ids) + self._sample_size(shard.names)
+            total += sys.getsizeof(shard.sizes) + sys.getsizeof(shard.lens)
+            total += sys.getsizeof(shard.tags)
+            total += sys.getsizeof(shard.alive) + sys.getsizeof(shard.pos)
+            total += sys.getsizeof(shard.postings)
+            total += sum(sys.getsizeof(p) for p in shard.postings.values())
+        return total
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "docs": {name: s.live for name, s in self.shards.items()},
+            "tokens": len(self.tokens),
+            "memory": self.memory_usage()
+        }
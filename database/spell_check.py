@@ -0,0 +1,155 @@
+import heapq
+
+# ─────────────────────────────────────────
+# 🔤 SYMSPELL (SYMMETRIC DELETE) SUGGESTIONS
+# ─────────────────────────────────────────
+# Catalog के title tokens से dictionary बनती है। Lookup में सिर्फ query word
+# के deletes बनते हैं और dict में मिलाए जाते हैं — कोई full scan नहीं।
+
+
+def _deletes(word, max_edit):
+    """All strings reachable from word by up to max_edit deletions"""
+    out = {word}
+    frontier = {word}
+    for _ in range(max_edit):
+        nxt = set()
+        for w in frontier:
+            if len(w) <= 1:
+                continue
+            for i in range(len(w)):
+                nxt.add(w[:i] + w[i + 1:])
+        out |= nxt
+        frontier = nxt
+    return out
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance; returns limit + 1 once exceeded"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            v = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                v = min(v, prev2[j - 2] + 1)
+            cur[j] = v
+            row_min = min(row_min, v)
+        if row_min > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class SymSpell:
+    """
+    Word -> frequency dictionary plus a delete index over word prefixes.
+    A word joins the delete index once seen `min_count` times, which keeps
+    one-off junk tokens out of RAM. `deletes` values are a single word (str)
+    until a second word shares the same delete, then a list.
+    """
+
+    def __init__(self, max_edit=2, prefix_len=7, min_count=2):
+        self.max_edit = max_edit
+        self.prefix_len = prefix_len
+        self.min_count = min_count
+        self.words = {}
+        self.deletes = {}
+
+    def __len__(self):
+        return len(self.words)
+
+    def add(self, word):
+        if len(word) < 3 or word.isdigit():
+            return
+        freq = self.words.get(word, 0) + 1
+        self.words[word] = freq
+        if freq != self.min_count:
+            return
+        deletes = self.deletes
+        for d in _deletes(word[:self.prefix_len], self.max_edit):
+            cur = deletes.get(d)
+            if cur is None:
+                deletes[d] = word
+            elif isinstance(cur, str):
+                deletes[d] = [cur, word]
+            else:
+                cur.append(word)
+
+    def add_text(self, tokens):
+        for tok in tokens:
+            self.add(tok)
+
+    def lookup(self, word, top=3):
+        """Best dictionary words for `word`: [(word, distance, freq)]"""
+        freq = self.words.get(word)
+        if freq:
+            return [(word, 0, freq)]
+        # words below min_count are known (no correction) but never suggested
+
+        # Short words: 2 edits match half the dictionary (and cost the most)
+        max_edit = min(self.max_edit, 1) if len(word) <= 4 else self.max_edit
+        seen = set()
+        found = []
+        for d in _deletes(word[:self.prefix_len], max_edit):
+            cands = self.deletes.get(d)
+            if cands is None:
+                continue
+            for cand in (cands,) if isinstance(cands, str) else cands:
+                if cand in seen:
+                    continue
+                seen.add(cand)
+                dist = edit_distance(word, cand, max_edit)
+                if dist <= max_edit:
+                    found.append((cand, dist, self.words[cand]))
+        found.sort(key=lambda x: (x[1], -x[2]))
+        return found[:top]
+
+    def suggest(self, tokens, count=3, max_unknown=3):
+        """
+        Whole-query corrections, best first. Known words are kept; each
+        unknown word is replaced by one of its top matches. Combinations are
+        built word by word keeping only the best few (beam), so cost grows
+        linearly with query length instead of as a cartesian product.
+        More than `max_unknown` unknown words is chat, not a title: no lookup.
+        """
+        unknown = sum(
+            1 for tok in tokens
+            if len(tok) >= 3 and not tok.isdigit() and tok not in self.words
+        )
+        if unknown > max_unknown:
+            return []
+
+        options = []
+        changed = False
+        for tok in tokens:
+            found = self.lookup(tok) if len(tok) >= 3 and not tok.isdigit() else None
+            if not found:
+                options.append([(tok, 0, 0)])
+            else:
+                options.append(found)
+                changed = changed or found[0][1] > 0
+        if not changed:
+            return []
+
+        width = count * 2
+        beam = [(0, 0, ())]     # (total distance, -total freq, words)
+        for opts in options:
+            beam = heapq.nsmallest(
+                width,
+                ((dist + d, neg_freq - f, words + (w,)) for dist, neg_freq, words in beam for w, d, f in opts)
+            )
+
+        original = " ".join(tokens)
+        out = []
+        for _, _, words in beam:
+            text = " ".join(words)
+            if text != original and text not in out:
+                out.append(text)
+            if len(out) >= count:
+                break
+        return out
@@ -1,4 +1,7 @@
+import logging
 import motor.motor_asyncio
+from datetime import datetime
+from pymongo.errors import OperationFailure
 from info import (
     BOT_ID,
     DATABASE_URL,
@@ -8,9 +11,12 @@ from info import (
     WELCOME_TEXT,
     SPELL_CHECK,
     PROTECT_CONTENT,
-    AUTO_DELETE
+    AUTO_DELETE,
+    SEARCH_STATE_TTL
 )
 
+logger = logging.getLogger(__name__)
+
 # ─────────────────────────────────────────────
 # 🔌 ASYNC DATABASE CONNECTION (High Speed)
 # ─────────────────────────────────────────────
@@ -31,6 +37,8 @@ class Database:
         self.premium = self.db.Premiums
         self.connections = self.db.Connections
         self.settings = self.db.Settings
+        self.index_jobs = self.db.IndexJobs
+        self.searches = self.db.SearchStates
 
     # Default settings
     default_setgs = {
@@ -210,6 +218,56 @@ class Database:
             {"$pull": {"group_ids": group_id}}
         )
 
+    # ───────── INDEX JOBS (RESUME) ─────────
+
+    async def save_index_job(self, job_id, data):
+        await self.index_jobs.update_one(
+            {"_id": job_id},
+            {"$set": data},
+            upsert=True
+        )
+
+    async def get_index_job(self, job_id):
+        return await self.index_jobs.find_one({"_id": job_id})
+
+    async def get_index_jobs(self, chat=None):
+        query = {} if chat is None else {"chat": chat}
+        return await self.index_jobs.find(query).to_list(length=None)
+
+    async def delete_index_job(self, job_id):
+        await self.index_jobs.delete_one({"_id": job_id})
+
+    # ───────── SEARCH STATE (SHARED PAGINATION) ─────────
+    # Result buttons सिर्फ message id भेजते हैं; query यहाँ से मिलती है ताकि
+    # restart / दूसरे replica पर भी Next/Prev चलें। TTL index पुराने docs हटाता है।
+
+    async def ensure_indexes(self):
+        try:
+            await self.searches.create_index("at", expireAfterSeconds=SEARCH_STATE_TTL, background=True)
+        except OperationFailure as e:
+            # SEARCH_STATE_TTL बदला है → पुराना TTL index options conflict देगा, उसे update करो
+            if e.code not in (85, 86):  # IndexOptionsConflict / IndexKeySpecsConflict
+                logger.error(f"SearchStates index creation failed: {e}")
+                return
+            try:
+                await self.db.command(
+                    "collMod", self.searches.name,
+                    index={"keyPattern": {"at": 1}, "expireAfterSeconds": SEARCH_STATE_TTL}
+                )
+                logger.info(f"SearchStates TTL updated to {SEARCH_STATE_TTL}s")
+            except Exception as e:
+                logger.error(f"SearchStates TTL update failed: {e}")
+
+    async def save_search(self, key, search, suggestions=None):
+        await self.searches.update_one(
+            {"_id": key},
+            {"$set": {"q": search, "s": suggestions, "at": datetime.utcnow()}},
+            upsert=True
+        )
+
+    async def get_search(self, key):
+        return await self.searches.find_one({"_id": key})
+
     # ───────── BOT & STATS ─────────
     
     async def update_bot_sttgs(self, var, val):
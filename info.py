@@ -102,7 +102,61 @@ if not DATABASE_URL:
 TIME_ZONE = environ.get("TIME_ZONE", "Asia/Kolkata")
 DELETE_TIME = int(environ.get("DELETE_TIME", 3600))
 CACHE_TIME = int(environ.get("CACHE_TIME", 300))
+SEARCH_CACHE_MB = int(environ.get("SEARCH_CACHE_MB", 32))
+# Recently requested file docs kept in RAM (deep link delivery)
+FILE_CACHE_SIZE = int(environ.get("FILE_CACHE_SIZE", 2000))
+# Search result sessions (buttons): idle lifetime and RAM budget
+SESSION_TTL = int(environ.get("SESSION_TTL", 3600))
+SESSION_CACHE_MB = int(environ.get("SESSION_CACHE_MB", 16))
+# Rendered result lines (per chat + file) reused across page views
+FRAGMENT_CACHE_SIZE = int(environ.get("FRAGMENT_CACHE_SIZE", 5000))
+# Shared (Mongo) search state for result buttons — survives restarts / replicas
+SEARCH_STATE_TTL = int(environ.get("SEARCH_STATE_TTL", 86400))
 MAX_BTN = int(environ.get("MAX_BTN", 12))
+# 0 = exact total; otherwise find() counts / RAM index scans stop here and UI
+# shows "1000+" ($facet totals stay exact — that scan can't stop early)
+SEARCH_COUNT_CAP = int(environ.get("SEARCH_COUNT_CAP", 1000))
+# Background fetches of the next result page at a time (0 = no prefetch)
+PREFETCH_WORKERS = int(environ.get("PREFETCH_WORKERS", 4))
+# Search rate limits (token buckets): searches/sec + burst, per user and per group (rate 0 = off)
+USER_SEARCH_RATE = float(environ.get("USER_SEARCH_RATE", 0.5))
+USER_SEARCH_BURST = int(environ.get("USER_SEARCH_BURST", 5))
+CHAT_SEARCH_RATE = float(environ.get("CHAT_SEARCH_RATE", 3))
+CHAT_SEARCH_BURST = int(environ.get("CHAT_SEARCH_BURST", 20))
+# Premium users: rate and burst multiplied by this
+PREMIUM_SEARCH_MULT = float(environ.get("PREMIUM_SEARCH_MULT", 2))
+# Server-side time limit for speculative fan-out lookups (Cloud/Archive while
+# Primary runs) so abandoned ones stop on Mongo too; needed ones rerun unlimited
+SEARCH_TIMEOUT_MS = int(environ.get("SEARCH_TIMEOUT_MS", 3000))
+# Typo/partial fallback: minimum trigram overlap (0-1) to count as a hit
+FUZZY_MIN_SCORE = float(environ.get("FUZZY_MIN_SCORE", 0.5))
+# "Did you mean" dictionary: max typos per word (1 = less RAM)
+SPELL_MAX_EDIT = int(environ.get("SPELL_MAX_EDIT", 2))
+# Tokens seen fewer times than this are never suggested (saves RAM)
+SPELL_MIN_COUNT = int(environ.get("SPELL_MIN_COUNT", 2))
+# Indexer bulk writes: flush every N files or T ms, whichever first
+INDEX_BATCH_SIZE = int(environ.get("INDEX_BATCH_SIZE", 500))
+INDEX_FLUSH_MS = int(environ.get("INDEX_FLUSH_MS", 2000))
+# Message fetcher: batches (200 ids) in flight / buffered ahead / retries
+FETCH_WORKERS = int(environ.get("FETCH_WORKERS", 3))
+FETCH_LOOKAHEAD = int(environ.get("FETCH_LOOKAHEAD", 6))
+FETCH_RETRIES = int(environ.get("FETCH_RETRIES", 3))
+# Indexing jobs: checkpoint to Mongo every N messages; resume after restart
+INDEX_CHECKPOINT = int(environ.get("INDEX_CHECKPOINT", 1000))
+# Job queue: channels indexed in parallel; get_messages calls/sec shared by all (0 = no limit)
+INDEX_WORKERS = int(environ.get("INDEX_WORKERS", 2))
+INDEX_RATE = float(environ.get("INDEX_RATE", 3))
+# Seconds between indexing progress edits (edits run in their own task)
+INDEX_PROGRESS_SECS = int(environ.get("INDEX_PROGRESS_SECS", 10))
+# Live indexing of INDEX_CHANNELS: new posts are bulk-saved this often
+LIVE_FLUSH_MS = int(environ.get("LIVE_FLUSH_MS", 3000))
+# /reconcile: file ids test-sent to BIN_CHANNEL per second
+RECONCILE_RATE = float(environ.get("RECONCILE_RATE", 2))
+# /delete, /delete_all: docs per delete batch and pause between batches
+DELETE_BATCH_SIZE = int(environ.get("DELETE_BATCH_SIZE", 1000))
+DELETE_PAUSE_MS = int(environ.get("DELETE_PAUSE_MS", 50))
+# /backfill (schema migration): pause between 1000-doc batches
+MIGRATE_PAUSE_MS = int(environ.get("MIGRATE_PAUSE_MS", 50))
 
 LANGUAGES = environ.get(
     "LANGUAGES", "hindi english"
@@ -123,12 +177,19 @@ PM_FILE_DELETE_TIME = int(environ.get("PM_FILE_DELETE_TIME", 3600))
 # 🧩 FEATURE FLAGS (CLEAN)
 # ─────────────────────────────────────────────
 USE_CAPTION_FILTER = is_enabled("USE_CAPTION_FILTER", True)
+# One-letter derived field names (smaller docs). Switch, then run /migrate.
+COMPACT_SCHEMA = is_enabled("COMPACT_SCHEMA", False)
 AUTO_DELETE = is_enabled("AUTO_DELETE", False)
 WELCOME = is_enabled("WELCOME", False)
 PROTECT_CONTENT = is_enabled("PROTECT_CONTENT", False)
 SPELL_CHECK = is_enabled("SPELL_CHECK", True)
 IS_STREAM = is_enabled("IS_STREAM", True)
 IS_PREMIUM = is_enabled("IS_PREMIUM", True)
+SEARCH_FANOUT = is_enabled("SEARCH_FANOUT", True)
+SEARCH_FACET = is_enabled("SEARCH_FACET", True)
+MEMORY_INDEX = is_enabled("MEMORY_INDEX", False)
+INDEX_AUTO_RESUME = is_enabled("INDEX_AUTO_RESUME", False)
+CROSS_DEDUPE = is_enabled("CROSS_DEDUPE", True)
 
 
 # ─────────────────────────────────────────────
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+from hydrogram import Client, filters
+from info import INDEX_CHANNELS, INDEX_BATCH_SIZE, LIVE_FLUSH_MS
+from database.ia_filterdb import BulkSaver
+from database.users_chats_db import db
+from plugins.index import indexable_media, index_queue
+
+logger = logging.getLogger(__name__)
+
+# ─────────────────────────────────────────────
+# 📡 LIVE INDEXING (INDEX_CHANNELS)
+# ─────────────────────────────────────────────
+# नई posts तुरंत buffer में जाती हैं और हर LIVE_FLUSH_MS पर एक bulk insert
+# होता है। हर channel का last saved message id bot settings में रहता है
+# (live_last), downtime के बाद पहली नई post से gap पकड़कर catch-up होता है।
+
+CATCH_UP_RETRY = 30            # seconds before the first retry of a failed catch-up
+CATCH_UP_RETRY_MAX = 1800
+
+class LiveIndexer:
+
+    def __init__(self, collection_type="primary"):
+        self.saver = BulkSaver(collection_type, batch_size=INDEX_BATCH_SIZE, flush_ms=0)
+        self.latest = None          # chat -> highest message id seen (gap detection)
+        self.seen = {}              # chat -> highest id buffered since last persist
+        self.catching = set()       # chats with a catch-up in progress
+        self._flusher = None
+
+    async def _load(self):
+        if self.latest is None:
+            sttgs = await db.get_bot_sttgs()
+            self.latest = dict(sttgs.get("live_last", {}))
+
+    async def handle(self, bot, message):
+        await self._load()
+        chat = str(message.chat.id)
+        last = self.latest.get(chat)
+        if last is not None and message.id > last + 1 and chat not in self.catching:
+            self.catching.add(chat)
+            asyncio.create_task(self._catch_up(bot, message.chat.id, last + 1, message.id))
+        if last is None or message.id > last:
+            self.latest[chat] = message.id
+        await self._buffer(chat, message)
+
+    async def _buffer(self, chat, message):
+        media, _ = indexable_media(message)
+        if media:
+            await self.saver.add(media)
+        if message.id > self.seen.get(chat, 0):
+            self.seen[chat] = message.id
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def _catch_up(self, bot, chat_id, start, end):
+        chat = str(chat_id)
+        delay = CATCH_UP_RETRY
+        while True:
+            logger.info(f"Live index: catching up {chat} messages {start}-{end - 1}")
+            try:
+                async for message in bot.iter_messages(chat_id, end, start, budget=index_queue.budget):
+                    await self._buffer(chat, message)
+                    start = message.id + 1
+                break
+            except Exception as e:
+                # Chat `catching` में ही रहता है → checkpoint gap से आगे नहीं जाता,
+                # बचा हुआ range backoff के बाद फिर से fetch होता है
+                logger.error(f"Live index catch-up failed for {chat}, retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, CATCH_UP_RETRY_MAX)
+        self.catching.discard(chat)
+        await self.persist()
+        logger.info(f"Live index: {chat} caught up to {end}")
+
+    async def persist(self):
+        """Flush buffered docs, then record how far each channel is saved"""
+        ready = {c: m for c, m in self.seen.items() if c not in self.catching}
+        if not ready:
+            return
+        await self.saver.flush()
+        for chat, msg_id in ready.items():
+            if self.seen.get(chat) == msg_id:
+                del self.seen[chat]
+            await db.update_bot_sttgs(f"live_last.{chat}", msg_id)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(LIVE_FLUSH_MS / 1000)
+            try:
+                await self.persist()
+            except Exception as e:
+                logger.error(f"Live index flush failed: {e}")
+
+
+live_indexer = LiveIndexer()
+
+
+@Client.on_message(filters.channel & filters.chat(INDEX_CHANNELS))
+async def live_index(bot, message):
+    await live_indexer.handle(bot, message)
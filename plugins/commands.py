@@ -2,17 +2,21 @@ import os
 import random
 import asyncio
 from datetime import datetime
-from time import time as time_now
+from time import time as time_now, perf_counter
 from hydrogram import Client, filters, enums
 from hydrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
 from Script import script
-from database.ia_filterdb import db_count_documents, get_file_details, delete_files
+from database.ia_filterdb import (
+    db_count_documents, get_file_details, delete_files, count_files, file_cache, COLLECTION_CODES,
+    search_cache, title_index, spell, backfill_fields, dedupe_files, get_search_results, FileCache
+)
 from database.users_chats_db import db
+from plugins.filter import sessions, fragment_cache, render_page, user_limiter, chat_limiter
 
 from info import (
     IS_PREMIUM, URL, BIN_CHANNEL, STICKERS, ADMINS, 
-    LOG_CHANNEL, PICS, IS_STREAM, REACTIONS, PM_FILE_DELETE_TIME
+    LOG_CHANNEL, PICS, IS_STREAM, REACTIONS, PM_FILE_DELETE_TIME, MAX_BTN
 )
 from utils import (
     is_premium, get_settings, get_size, temp, 
@@ -86,7 +90,8 @@ async def start(client, message):
     if len(message.command) > 1 and message.command[1] != "premium":
         try:
             data = message.command[1]
-            parts = data.split("_")
+            # file{hint}_{grp}_{id} — file_id (base64) may itself contain "_"
+            parts = data.split("_", 2)
             
             if len(parts) >= 3:
                 try: await message.delete()
@@ -94,9 +99,10 @@ async def start(client, message):
                 
                 grp_id = int(parts[1])
                 file_id = parts[2]
+                hint = COLLECTION_CODES.get(parts[0][4:])
                 
                 # Async DB Calls
-                file = await get_file_details(file_id)
+                file = await get_file_details(file_id, hint)
                 if not file:
                     return await message.reply("❌ File Not Found!")
                 
@@ -163,6 +169,22 @@ async def stats(_, message):
     
     # Direct Motor Count (Super Fast)
     premium = await db.premium.count_documents({"status.premium": True})
+    cache = search_cache.stats()
+    fcache = file_cache.stats()
+    sess = sessions.stats()
+    frag = fragment_cache.stats()
+    ulim, clim = user_limiter.stats(), chat_limiter.stats()
+
+    ram_index = ""
+    if title_index is not None:
+        idx = title_index.stats()
+        ram_index = (
+            f"\n🧠 <b>RAM Index:</b> `{'Ready' if idx['ready'] else 'Loading'}`\n"
+            f" • Files: `{sum(idx['docs'].values())}` | Tokens: `{idx['tokens']}`\n"
+            f" • Memory: `{get_size(idx['memory'])}`\n"
+        )
+    if spell is not None:
+        ram_index += f"\n🔤 <b>Spell Dictionary:</b> `{len(spell)}` words (`{len(spell.deletes)}` deletes)\n"
 
     text = f"""
 📊 <b>Bot Statistics</b>
@@ -176,10 +198,111 @@ async def stats(_, message):
  • Cloud: `{files['cloud']}`
  • Archive: `{files['archive']}`
 
+🗃 <b>Search Cache:</b> `{cache['hit_rate']}%` hit rate
+ • Hits / Misses: `{cache['hits']}` / `{cache['misses']}`
+ • Entries: `{cache['entries']}` ({get_size(cache['size'])})
+ • Evictions: `{cache['evictions']}`
+ • Coalesced: `{cache['coalesced']}`
+📄 <b>File Cache:</b> `{fcache['entries']}` docs, `{fcache['hit_rate']}%` hit rate
+🔘 <b>Sessions:</b> `{sess['entries']}` ({get_size(sess['size'])}), `{sess['hit_rate']}%` hit rate
+ • Expired / Evicted: `{sess['expired']}` / `{sess['evicted']}`
+🧩 <b>Page Fragments:</b> `{frag['entries']}` lines, `{frag['hit_rate']}%` hit rate
+🚦 <b>Rate Limited:</b> users `{ulim['limited']}` / `{ulim['allowed'] + ulim['limited']}`, groups `{clim['limited']}` / `{clim['allowed'] + clim['limited']}`
+ • Active buckets: `{ulim['keys']}` users, `{clim['keys']}` groups
+{ram_index}
 ⏱ <b>Uptime:</b> `{get_readable_time(time_now() - temp.START_TIME)}`
 """
     await msg.edit(text)
 
+# ─────────────────────────
+# /bench COMMAND (result page render cost)
+# ─────────────────────────
+@Client.on_message(filters.command("bench") & filters.user(ADMINS))
+async def bench_cmd(client, message):
+    """Per-page render cost: cold (every line built) vs warm (cached fragments)"""
+    search = " ".join(message.command[1:]) or "movie"
+    start = perf_counter()
+    files, next_off, total, source = await get_search_results(search, max_results=MAX_BTN, collection_type="all")
+    fetch_ms = (perf_counter() - start) * 1000
+    if not files:
+        # DB में कुछ नहीं मिला → synthetic page, सिर्फ render cost नापना है
+        files = [
+            {"_id": f"BQACAgUAAxkBAAI{i:020d}", "file_name": f"Sample Movie {i} (2024) 1080p WEB-DL x264.mkv", "file_size": 1610612736 + i}
+            for i in range(MAX_BTN)
+        ]
+        next_off, total, source = MAX_BTN, MAX_BTN * 10, "primary"
+
+    rounds = 1000
+    chat, req = message.chat.id, message.from_user.id
+
+    def per_page(cache):
+        t = perf_counter()
+        for _ in range(rounds):
+            render_page(chat, req, message.id, search, files, total, next_off, 2, source, cache=cache)
+        return (perf_counter() - t) * 1e6 / rounds
+
+    cold = per_page(FileCache(0))                   # cache कभी hit नहीं होता
+    warm_cache = FileCache(len(files))
+    render_page(chat, req, message.id, search, files, total, next_off, 2, source, cache=warm_cache)
+    warm = per_page(warm_cache)
+
+    await message.reply(
+        f"<b>🧩 Page Render Benchmark</b>\n\n"
+        f"🔍 Query: `{search}` ({len(files)} files/page, {rounds} rounds)\n"
+        f"🗄 DB fetch: `{fetch_ms:.1f} ms`\n"
+        f"❄️ Cold render: `{cold:.1f} µs/page`\n"
+        f"🔥 Warm render: `{warm:.1f} µs/page` (`{cold / warm:.1f}x`)"
+    )
+
+# ─────────────────────────
+# /backfill (/migrate) COMMAND (old docs → current schema / COMPACT_SCHEMA)
+# ─────────────────────────
+@Client.on_message(filters.command(["backfill", "migrate"]) & filters.user(ADMINS))
+async def backfill_cmd(client, message):
+    storage = message.command[1].lower() if len(message.command) > 1 else "all"
+    if storage not in ["primary", "cloud", "archive", "all"]:
+        return await message.reply("❌ Invalid Storage!")
+
+    msg = await message.reply(f"🧩 Migrating files in `{storage}` to the current schema...")
+    start = time_now()
+    last_edit = 0
+
+    async def progress(name, updated):
+        nonlocal last_edit
+        if time_now() - last_edit < 5:
+            return
+        last_edit = time_now()
+        try:
+            await msg.edit(
+                f"🧩 Migrating `{storage}`...\n"
+                f"📚 Now: `{name}` | Updated: `{updated}`\n"
+                f"⏱ `{get_readable_time(time_now() - start)}`"
+            )
+        except Exception:
+            pass
+
+    count = await backfill_fields(storage, progress=progress) # Batched, online
+    await msg.edit(f"✅ Updated `{count}` files in `{storage}`.")
+
+# ─────────────────────────
+# /dedupe COMMAND (same file in several collections)
+# ─────────────────────────
+@Client.on_message(filters.command("dedupe") & filters.user(ADMINS))
+async def dedupe_cmd(client, message):
+    dry_run = len(message.command) > 1 and message.command[1].lower() == "dry"
+    msg = await message.reply(f"🧬 Finding duplicates{' (dry run)' if dry_run else ''}...")
+    try:
+        groups, removed = await dedupe_files(dry_run) # Async
+    except Exception as e:
+        return await msg.edit(f"❌ Dedupe failed: `{e}`")
+
+    verb = "Would remove" if dry_run else "Removed"
+    lines = "\n".join(f" • {name.title()}: `{count}`" for name, count in removed.items())
+    await msg.edit(
+        f"✅ Found `{groups}` duplicated files.\n{verb} `{sum(removed.values())}` copies:\n{lines}\n\n"
+        f"ℹ️ Files saved before fingerprints existed need /backfill first."
+    )
+
 # ─────────────────────────
 # /delete COMMAND
 # ─────────────────────────
@@ -194,11 +317,20 @@ async def delete_file_cmd(client, message):
     if storage not in ["primary", "cloud", "archive"]:
         return await message.reply("❌ Invalid Storage! Use: primary, cloud, archive")
     
-    msg = await message.reply("🗑 Deleting...")
-    count = await delete_files(query, storage) # Async Call
-    
-    if count: await msg.edit(f"✅ Deleted `{count}` files from `{storage}`.")
-    else: await msg.edit("❌ No files found.")
+    msg = await message.reply("🔍 Counting...")
+    count = sum((await count_files(query, storage)).values()) # Dry run
+    if not count:
+        return await msg.edit("❌ No files found.")
+
+    remember_delete(msg, query)
+    btn = [[
+        InlineKeyboardButton("✅ CONFIRM DELETE", callback_data=f"confirm_del#{storage}#q"),
+        InlineKeyboardButton("❌ CANCEL", callback_data="cancel_del")
+    ]]
+    await msg.edit(
+        f"⚠️ `{count}` files in `{storage}` match `{query}`.\nDelete them?",
+        reply_markup=InlineKeyboardMarkup(btn)
+    )
 
 # ─────────────────────────
 # /delete_all COMMAND
@@ -217,17 +349,66 @@ async def delete_all_cmd(client, message):
         InlineKeyboardButton("❌ CANCEL", callback_data="close_data")
     ]]
     
+    count = sum((await count_files("*", storage)).values()) # Dry run
     await message.reply(
-        f"⚠️ <b>WARNING!</b>\n\nDeleting ALL files from `{storage}`.\nConfirm?",
+        f"⚠️ <b>WARNING!</b>\n\nDeleting ALL `{count}` files from `{storage}`.\nConfirm?",
         reply_markup=InlineKeyboardMarkup(btn)
     )
 
-@Client.on_callback_query(filters.regex(r"^confirm_del#"))
+# /delete query (too long for callback_data) → (chat, confirm message id).
+# Message ids सिर्फ chat में unique हैं, इसलिए chat भी key में है।
+PENDING_DELETES = {}
+PENDING_DELETE_TTL = 600
+PENDING_DELETE_MAX = 100
+
+def remember_delete(msg, search):
+    now = time_now()
+    for key in [k for k, (_, expires) in PENDING_DELETES.items() if expires <= now]:
+        del PENDING_DELETES[key]
+    while len(PENDING_DELETES) >= PENDING_DELETE_MAX:
+        del PENDING_DELETES[next(iter(PENDING_DELETES))]   # oldest first
+    PENDING_DELETES[(msg.chat.id, msg.id)] = (search, now + PENDING_DELETE_TTL)
+
+def pop_delete(msg):
+    search, expires = PENDING_DELETES.pop((msg.chat.id, msg.id), (None, 0))
+    return search if expires > time_now() else None
+
+@Client.on_callback_query(filters.regex(r"^cancel_del$") & filters.user(ADMINS))
+async def cancel_del(client, query):
+    pop_delete(query.message)
+    try: await query.message.delete()
+    except: pass
+
+@Client.on_callback_query(filters.regex(r"^confirm_del#") & filters.user(ADMINS))
 async def confirm_del(client, query):
-    storage = query.data.split("#")[1]
+    parts = query.data.split("#")
+    storage = parts[1]
+    if len(parts) > 2:
+        search = pop_delete(query.message)
+        if search is None:
+            return await query.message.edit("❌ Delete request expired. Send /delete again.")
+    else:
+        search = "*"
     await query.message.edit("🗑 Processing... This may take time.")
-    
-    count = await delete_files("*", storage) # Async
+
+    start = time_now()
+    last_edit = 0
+
+    async def progress(name, deleted):
+        nonlocal last_edit
+        if time_now() - last_edit < 5:
+            return
+        last_edit = time_now()
+        try:
+            await query.message.edit(
+                f"🗑 Deleting from `{storage}`...\n"
+                f"📚 Now: `{name}` | Deleted: `{deleted}`\n"
+                f"⏱ `{get_readable_time(time_now() - start)}`"
+            )
+        except Exception:
+            pass
+
+    count = await delete_files(search, storage, progress=progress) # Batched
     await query.message.edit(f"✅ Deleted `{count}` files from `{storage}`.")
 
 # ─────────────────────────
@@ -1,29 +1,231 @@
 import asyncio
+import logging
 import re
-import math
 import random
 from hydrogram import Client, filters, enums
 from hydrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
 from info import (
-    ADMINS, DELETE_TIME, MAX_BTN, IS_PREMIUM, PICS
+    ADMINS, DELETE_TIME, MAX_BTN, IS_PREMIUM, PICS, LANGUAGES, QUALITY,
+    SESSION_TTL, SESSION_CACHE_MB, FRAGMENT_CACHE_SIZE, PREFETCH_WORKERS,
+    USER_SEARCH_RATE, USER_SEARCH_BURST, CHAT_SEARCH_RATE, CHAT_SEARCH_BURST, PREMIUM_SEARCH_MULT
 )
 from utils import (
-    is_premium, get_size, is_check_admin,
-    temp, get_settings, save_group_settings
+    is_premium, has_premium_plan, get_size, is_check_admin,
+    temp, get_settings, save_group_settings, SessionStore, RateLimiter
 )
 # Note: Ensure these imports exist in your project structure
-from database.ia_filterdb import get_search_results
+from database.ia_filterdb import (
+    get_search_results, format_count, page_cursor, spell_suggestions, COLLECTION_CODES, FileCache,
+    title_index, search_cache
+)
+from database.users_chats_db import db
+
+logger = logging.getLogger(__name__)
+
+# ─────────────────────────────────────────────
+# ⚡ SEARCH SESSIONS (LRU + TTL, RAM Budget)
+# ─────────────────────────────────────────────
+# Page / source / filters callback_data में ही रहते हैं; session में सिर्फ
+# query (+ spell suggestions) है, जो Mongo (db.searches) में भी save होती है।
+# RAM miss (restart / दूसरा replica) पर वहीं से load होती है।
+# Cursors सिर्फ RAM optimization हैं — न मिलें तो offset से page बनता है।
+class SearchSession:
+    __slots__ = ("search", "cursors", "suggestions")
+
+    def __init__(self, search, suggestions=None):
+        self.search = search
+        self.cursors = {}           # (source, lang, quality, offset) -> (score, _id)
+        self.suggestions = suggestions
+
+    def nbytes(self):
+        """Rough RAM footprint for the store's byte budget"""
+        size = 200 + len(self.search)
+        size += 150 * len(self.cursors)
+        size += sum(60 + len(s) for s in self.suggestions or ())
+        return size
+
+# key = "{chat_id}-{msg_id}" of the user's search message
+sessions = SessionStore(SESSION_TTL, SESSION_CACHE_MB * 1024 * 1024)
+
+SOURCE_CODES = {name: code for code, name in COLLECTION_CODES.items()}
+
+def save_session(key, session):
+    """RAM now; the shared copy is written in the background (no wait before reply)"""
+    sessions.put(key, session)
+    asyncio.create_task(_store_session(key, session))
+
+async def _store_session(key, session):
+    try:
+        await db.save_search(key, session.search, session.suggestions)
+    except Exception as e:
+        logger.warning(f"Search state save failed for {key}: {e}")
+
+async def load_session(key):
+    """RAM first, then the shared store"""
+    session = sessions.get(key)
+    if session is None:
+        doc = await db.get_search(key)
+        if doc:
+            session = SearchSession(doc["q"], doc.get("s"))
+            sessions.put(key, session)
+    return session
+
+def pack_state(source, lang, quality):
+    """source code + filters for callback_data: "p_hindi_720p", "x__" """
+    return f"{SOURCE_CODES.get(source, 'x')}_{lang or ''}_{quality or ''}"
+
+def unpack_state(code, lang, quality):
+    source = COLLECTION_CODES.get(code, "all")
+    return source, (lang if lang in LANGUAGES else None), (quality if quality in QUALITY else None)
+
+def remember_cursor(session, key, source, lang, quality, offset, files):
+    """Store keyset cursor for the page after this one"""
+    if files:
+        session.cursors[(source, lang, quality, offset + MAX_BTN)] = page_cursor(files)
+        sessions.put(key, session)
+
+def file_link(chat_id, file, source):
+    """Deep link with a collection hint so delivery is one indexed lookup"""
+    src = file.get("src") or source
+    code = src[0] if src in ("primary", "cloud", "archive") else ""
+    return f"https://t.me/{temp.U_NAME}?start=file{code}_{chat_id}_{file['_id']}"
+
+def filter_label(lang, quality):
+    active = [t.title() for t in (lang, quality) if t]
+    return f"🎛 Filter: {', '.join(active)}\n" if active else ""
+
+def filter_buttons(req, mid, source, lang, quality):
+    """Language row + quality row; tap again to clear"""
+    rows = []
+    row = []
+    for tag in LANGUAGES:
+        tick = "✅ " if lang == tag else ""
+        state = pack_state(source, None if lang == tag else tag, quality)
+        row.append(InlineKeyboardButton(f"{tick}{tag.title()}", callback_data=f"filt_{req}_{mid}_{state}"))
+    if row:
+        rows.append(row)
+    row = []
+    for tag in QUALITY:
+        tick = "✅ " if quality == tag else ""
+        state = pack_state(source, lang, None if quality == tag else tag)
+        row.append(InlineKeyboardButton(f"{tick}{tag.title()}", callback_data=f"filt_{req}_{mid}_{state}"))
+    if row:
+        rows.append(row)
+    return rows
+
+
+# ─────────────────────────────────────────────
+# 🔮 NEXT PAGE PREFETCH
+# ─────────────────────────────────────────────
+# Page दिखते ही अगला page background में search_cache में आ जाता है, तो
+# "Next »" Mongo का wait किए बिना cache से जवाब देता है (अभी चल रहा हो तो
+# single-flight उसी से जुड़ जाता है)। Budget भरा हो तो prefetch skip होता है।
+_prefetch_slots = None
+
+def prefetch_next(key, session, source, lang, quality, next_off):
+    global _prefetch_slots
+    if not next_off or PREFETCH_WORKERS <= 0 or not search_cache.enabled:
+        return                      # cache off → prefetch would be a wasted search
+    if title_index is not None and title_index.ready:
+        return                      # RAM search already instant
+    if _prefetch_slots is None:
+        _prefetch_slots = asyncio.Semaphore(PREFETCH_WORKERS)
+    if _prefetch_slots.locked():
+        return
+    asyncio.create_task(_prefetch(key, session, source, lang, quality, next_off))
+
+async def _prefetch(key, session, source, lang, quality, offset):
+    async with _prefetch_slots:
+        if key not in sessions:
+            return                  # session expired → nobody will click Next
+        try:
+            await get_search_results(
+                session.search, max_results=MAX_BTN, offset=offset, collection_type=source,
+                cursor=session.cursors.get((source, lang, quality, offset)),
+                lang=lang, quality=quality
+            )
+        except Exception:
+            pass
+
+# ─────────────────────────────────────────────
+# 🧩 RESULT PAGE RENDERER (Fragment Cache)
+# ─────────────────────────────────────────────
+# हर file की line (deep link + size + name) एक बार बनती है और
+# (chat, _id, source) पर cache होती है; page सिर्फ cached lines का join है।
+fragment_cache = FileCache(FRAGMENT_CACHE_SIZE)
+
+def file_line(chat_id, file, source, cache=fragment_cache):
+    src = file.get("src") or source
+    fkey = (chat_id, file["_id"], src)
+    line = cache.get(fkey)
+    if line is None:
+        line = f"📁 <a href='{file_link(chat_id, file, src)}'>[{get_size(file['file_size'])}] {file['file_name']}</a>"
+        cache.put(fkey, line)
+    return line
+
+def render_page(chat_id, req, mid, search, files, total, next_off, page, source,
+                lang=None, quality=None, cache=fragment_cache):
+    """Caption + keyboard of one result page (search reply and every callback)"""
+    files_text = "\n\n".join([file_line(chat_id, f, source, cache) for f in files])
+    total_pages = format_count(total, MAX_BTN)
+    cap = (
+        f"<b>👑 Search: {search}\n"
+        f"🎬 Total: {format_count(total)}\n"
+        f"📚 Source: {source.upper()}\n"
+        f"{filter_label(lang, quality)}"
+        f"📄 Page: {page}/{total_pages}</b>\n\n"
+        f"{files_text}"
+    )
+
+    # Row 1: Navigation
+    state = pack_state(source, lang, quality)
+    nav = []
+    if page > 1:
+        nav.append(InlineKeyboardButton("« Prev", callback_data=f"nav_{req}_{mid}_{page - 1}_{state}"))
+    nav.append(InlineKeyboardButton(f"📄 {page}/{total_pages}", callback_data="pages"))
+    if next_off:
+        nav.append(InlineKeyboardButton("Next »", callback_data=f"nav_{req}_{mid}_{page + 1}_{state}"))
+    btn = [nav]
+
+    # Row 2: Collections
+    col_btn = []
+    for c in ["primary", "cloud", "archive"]:
+        tick = "✅" if c == source else "📂"
+        col_btn.append(InlineKeyboardButton(f"{tick} {c.title()}", callback_data=f"coll_{req}_{mid}_{pack_state(c, lang, quality)}"))
+    btn.append(col_btn)
+
+    # Row 3+: Language / Quality Filters, Last Row: Close
+    btn.extend(filter_buttons(req, mid, source, lang, quality))
+    btn.append([InlineKeyboardButton("❌ Close", callback_data="close_data")])
+    return cap, InlineKeyboardMarkup(btn)
 
 # ─────────────────────────────────────────────
-# ⚡ GLOBAL CACHE (With Auto-Cleaner)
+# 🚦 SEARCH RATE LIMIT (Per User + Per Group)
 # ─────────────────────────────────────────────
-BUTTONS = {}
-# Koyeb RAM को बचाने के लिए Cache Limit
-def check_cache_limit():
-    if len(BUTTONS) > 1000:
-        BUTTONS.clear()
-        temp.FILES.clear()
+# हर search कई Mongo queries चलाता है — spam करने वाले कुछ users पूरा
+# connection pool न खा जाएँ। Limit पार हो तो search DB तक जाता ही नहीं।
+user_limiter = RateLimiter(USER_SEARCH_RATE, USER_SEARCH_BURST)
+chat_limiter = RateLimiter(CHAT_SEARCH_RATE, CHAT_SEARCH_BURST)
+
+async def search_wait(client, user_id, chat_id=None, premium=None):
+    """
+    0 if this search may run, else seconds to wait. `premium`: status the
+    handler already checked; None → plan looked up once per new bucket
+    (the bucket remembers its size until it goes idle).
+    """
+    if user_limiter.rate <= 0 and chat_limiter.rate <= 0:
+        return 0
+    wait = 0
+    if user_limiter.rate > 0:
+        # Plan सिर्फ तब देखो जब user limiter चालू हो और bucket नया हो
+        if premium is None and user_id not in user_limiter:
+            premium = await has_premium_plan(user_id, client)
+        scale = None if premium is None else (PREMIUM_SEARCH_MULT if premium else 1)
+        wait = user_limiter.acquire(user_id, scale)
+    if not wait and chat_id is not None:
+        wait = chat_limiter.acquire(chat_id)
+    return wait
 
 # ─────────────────────────────────────────────
 # 🛠️ HELPER: VALIDATOR (FAST)
@@ -68,6 +270,13 @@ async def pm_search(client, message):
             ]])
         )
 
+    # IS_PREMIUM on → premium ऊपर check हो चुका है
+    wait = await search_wait(client, message.from_user.id, premium=True if IS_PREMIUM else None)
+    if wait:
+        m = await message.reply(f"⏳ Too many searches! Try again in {max(int(wait), 1)}s.")
+        asyncio.create_task(delete_later(m, 5))
+        return
+
     await auto_filter(client, message, collection_type="all")
 
 # ─────────────────────────────────────────────
@@ -114,6 +323,10 @@ async def group_search(client, message):
                 await message.delete()
                 return await message.reply("❌ Links not allowed!", quote=True)
 
+    # 5. Rate Limit (groups में चुपचाप ignore, ताकि chat में और spam न हो)
+    if await search_wait(client, user_id, chat_id, premium=True if IS_PREMIUM else None):
+        return
+
     await auto_filter(client, message, collection_type="all")
 
 # ─────────────────────────────────────────────
@@ -136,76 +349,61 @@ async def search_toggle(client, message):
 # ─────────────────────────────────────────────
 # 🚀 AUTO FILTER CORE (OPTIMIZED)
 # ─────────────────────────────────────────────
-async def auto_filter(client, msg, collection_type="all"):
-    check_cache_limit() # Free up RAM if needed
-
-    search = msg.text.strip()
+async def auto_filter(client, msg, collection_type="all", search=None):
+    search = search or msg.text.strip()
     
     # ⚡ DB Call (Async Motor)
     files, next_offset, total, actual_source = await get_search_results(
         search, max_results=MAX_BTN, offset=0, collection_type=collection_type
     )
 
+    key = f"{msg.chat.id}-{msg.id}"
+
     if not files:
+        # 🔤 Spell Check: "Did you mean" buttons (RAM dictionary, no DB call)
+        settings = await get_settings(msg.chat.id)
+        suggestions = spell_suggestions(search) if settings.get("spell_check") else []
+        if suggestions:
+            save_session(key, SearchSession(search, suggestions=suggestions))
+            btn = [
+                [InlineKeyboardButton(f"🔍 {s}", callback_data=f"spell_{msg.from_user.id}_{msg.id}_{i}")]
+                for i, s in enumerate(suggestions)
+            ]
+            btn.append([InlineKeyboardButton("❌ Close", callback_data="close_data")])
+            m = await msg.reply(
+                f"❌ No results for <b>{search}</b>\n\n🤔 <b>Did you mean:</b>",
+                reply_markup=InlineKeyboardMarkup(btn),
+                quote=True
+            )
+            asyncio.create_task(delete_later(m, 60))
+            return
+
         # Non-blocking delete for "not found" message
-        task = asyncio.create_task(msg.reply(f"❌ No results for <b>{search}</b>"))
-        await asyncio.sleep(5)
-        try: await (await task).delete()
-        except: pass
+        m = await msg.reply(f"❌ No results for <b>{search}</b>")
+        asyncio.create_task(delete_later(m, 5))
         return
 
-    key = f"{msg.chat.id}-{msg.id}"
-    temp.FILES[key] = files
-    BUTTONS[key] = search
-
-    # ⚡ Fast String Building (Join is faster than +=)
-    list_items = []
-    for file in files:
-        f_link = f"https://t.me/{temp.U_NAME}?start=file_{msg.chat.id}_{file['_id']}"
-        list_items.append(
-            f"📁 <a href='{f_link}'>[{get_size(file['file_size'])}] {file['file_name']}</a>"
-        )
-    files_text = "\n\n".join(list_items)
+    session = SearchSession(search)
+    remember_cursor(session, key, actual_source, None, None, 0, files)
+    save_session(key, session)
 
-    # Pages Calculation
-    total_pages = math.ceil(total / MAX_BTN)
-    
-    # UI Text
-    cap = (
-        f"<b>👑 Search: {search}\n"
-        f"🎬 Total: {total}\n"
-        f"📚 Source: {actual_source.upper()}\n"
-        f"📄 Page: 1/{total_pages}</b>\n\n"
-        f"{files_text}"
+    cap, markup = render_page(
+        msg.chat.id, msg.from_user.id, msg.id, search, files, total,
+        next_offset, 1, actual_source
     )
-
-    # ⚡ Button Logic (Clean)
-    btn = []
-    
-    # Row 1: Navigation
-    nav = [InlineKeyboardButton(f"📄 1/{total_pages}", callback_data="pages")]
-    if next_offset:
-        nav.append(InlineKeyboardButton("Next »", callback_data=f"nav_{msg.from_user.id}_{key}_{next_offset}_{actual_source}"))
-    btn.append(nav)
-
-    # Row 2: Collections
-    col_btn = []
-    for c in ["primary", "cloud", "archive"]:
-        tick = "✅" if c == actual_source else "📂"
-        col_btn.append(InlineKeyboardButton(f"{tick} {c.title()}", callback_data=f"coll_{msg.from_user.id}_{key}_{c}"))
-    btn.append(col_btn)
-
-    # Row 3: Close
-    btn.append([InlineKeyboardButton("❌ Close", callback_data="close_data")])
-
-    # Send Result
-    m = await msg.reply(cap, reply_markup=InlineKeyboardMarkup(btn), disable_web_page_preview=True)
+    m = await msg.reply(cap, reply_markup=markup, disable_web_page_preview=True)
+    prefetch_next(key, session, actual_source, None, None, next_offset)
 
     # ⚡ Non-Blocking Auto Delete
     settings = await get_settings(msg.chat.id)
     if settings.get("auto_delete"):
         asyncio.create_task(auto_delete_msg(m, msg))
 
+async def delete_later(bot_msg, delay):
+    await asyncio.sleep(delay)
+    try: await bot_msg.delete()
+    except: pass
+
 async def auto_delete_msg(bot_msg, user_msg):
     """Separate task to handle deletions without freezing bot"""
     await asyncio.sleep(DELETE_TIME)
@@ -220,138 +418,124 @@ async def auto_delete_msg(bot_msg, user_msg):
 @Client.on_callback_query(filters.regex(r"^nav_"))
 async def nav_handler(client, query):
     try:
-        _, req, key, offset, coll_type = query.data.split("_", 4)
+        _, req, mid, page, *state = query.data.split("_")
         if int(req) != query.from_user.id:
             return await query.answer("❌ Not for you!", show_alert=True)
+        curr_page = int(page)
+        coll_type, lang, quality = unpack_state(*state)
     except:
         return await query.answer("❌ Error!", show_alert=True)
 
     if IS_PREMIUM and not await is_premium(query.from_user.id, client):
         return await query.answer("❌ Premium Expired!", show_alert=True)
 
-    search = BUTTONS.get(key)
-    if not search:
+    key = f"{query.message.chat.id}-{mid}"
+    session = await load_session(key)
+    if not session:
         return await query.answer("❌ Search Expired! Search again.", show_alert=True)
+    search = session.search
 
-    # ⚡ DB Call
+    # ⚡ DB Call (keyset cursor मिले तो skip नहीं करना पड़ेगा)
+    offset = (curr_page - 1) * MAX_BTN
     files, next_off, total, act_src = await get_search_results(
-        search, max_results=MAX_BTN, offset=int(offset), collection_type=coll_type
+        search, max_results=MAX_BTN, offset=offset, collection_type=coll_type,
+        cursor=session.cursors.get((coll_type, lang, quality, offset)),
+        lang=lang, quality=quality
     )
     if not files: return await query.answer("❌ No more pages!", show_alert=True)
 
-    temp.FILES[key] = files
-
-    # Build Text
-    list_items = []
-    for file in files:
-        f_link = f"https://t.me/{temp.U_NAME}?start=file_{query.message.chat.id}_{file['_id']}"
-        list_items.append(f"📁 <a href='{f_link}'>[{get_size(file['file_size'])}] {file['file_name']}</a>")
-    
-    total_pages = math.ceil(total / MAX_BTN)
-    curr_page = (int(offset) // MAX_BTN) + 1
-    
-    # 🔥 FIXED HERE: Using variable instead of joining inside f-string
-    files_text = "\n\n".join(list_items)
+    remember_cursor(session, key, act_src, lang, quality, offset, files)
 
-    cap = (
-        f"<b>👑 Search: {search}\n"
-        f"🎬 Total: {total}\n"
-        f"📚 Source: {act_src.upper()}\n"
-        f"📄 Page: {curr_page}/{total_pages}</b>\n\n"
-        f"{files_text}"
+    cap, markup = render_page(
+        query.message.chat.id, req, mid, search, files, total,
+        next_off, curr_page, act_src, lang, quality
     )
-
-    # Build Buttons
-    btn = []
-    nav = []
-    prev_off = int(offset) - MAX_BTN
-    
-    if prev_off >= 0:
-        nav.append(InlineKeyboardButton("« Prev", callback_data=f"nav_{req}_{key}_{prev_off}_{act_src}"))
-    nav.append(InlineKeyboardButton(f"📄 {curr_page}/{total_pages}", callback_data="pages"))
-    if next_off:
-        nav.append(InlineKeyboardButton("Next »", callback_data=f"nav_{req}_{key}_{next_off}_{act_src}"))
-    btn.append(nav)
-
-    col_btn = []
-    for c in ["primary", "cloud", "archive"]:
-        tick = "✅" if c == act_src else "📂"
-        col_btn.append(InlineKeyboardButton(f"{tick} {c.title()}", callback_data=f"coll_{req}_{key}_{c}"))
-    btn.append(col_btn)
-    btn.append([InlineKeyboardButton("❌ Close", callback_data="close_data")])
-
     try:
-        await query.message.edit_text(cap, reply_markup=InlineKeyboardMarkup(btn), disable_web_page_preview=True)
+        await query.message.edit_text(cap, reply_markup=markup, disable_web_page_preview=True)
     except:
         pass
     await query.answer()
+    prefetch_next(key, session, act_src, lang, quality, next_off)
 
 # ─────────────────────────────────────────────
-# 🗂️ COLLECTION SWITCH HANDLER
+# 🗂️ COLLECTION SWITCH / 🎛 LANGUAGE-QUALITY FILTER HANDLER
 # ─────────────────────────────────────────────
-@Client.on_callback_query(filters.regex(r"^coll_"))
+# दोनों buttons में target state (source + filters) पहले से packed है
+@Client.on_callback_query(filters.regex(r"^(coll|filt)_"))
 async def coll_handler(client, query):
     try:
-        _, req, key, coll_type = query.data.split("_", 3)
+        _, req, mid, *state = query.data.split("_")
         if int(req) != query.from_user.id:
             return await query.answer("❌ Not for you!", show_alert=True)
+        coll_type, lang, quality = unpack_state(*state)
     except:
         return
 
     if IS_PREMIUM and not await is_premium(query.from_user.id, client):
         return await query.answer("❌ Premium Expired!", show_alert=True)
 
-    search = BUTTONS.get(key)
-    if not search:
+    key = f"{query.message.chat.id}-{mid}"
+    session = await load_session(key)
+    if not session:
         return await query.answer("❌ Search Expired!", show_alert=True)
+    await show_first_page(query, req, mid, key, session, coll_type, lang, quality)
+
+async def show_first_page(query, req, mid, key, session, coll_type, lang, quality):
+    """Edit the result message to page 1 of `coll_type` with the given filters"""
+    search = session.search
 
-    # ⚡ DB Call
+    # ⚡ DB Call (filters DB query में ही लगते हैं)
     files, next_off, total, act_src = await get_search_results(
-        search, max_results=MAX_BTN, offset=0, collection_type=coll_type
+        search, max_results=MAX_BTN, offset=0, collection_type=coll_type,
+        lang=lang, quality=quality
     )
     if not files:
-        return await query.answer(f"❌ No files in {coll_type.upper()}", show_alert=True)
-
-    temp.FILES[key] = files
+        await query.answer(f"❌ No files in {coll_type.upper()}", show_alert=True)
+        return False
 
-    # Build Text
-    list_items = []
-    for file in files:
-        f_link = f"https://t.me/{temp.U_NAME}?start=file_{query.message.chat.id}_{file['_id']}"
-        list_items.append(f"📁 <a href='{f_link}'>[{get_size(file['file_size'])}] {file['file_name']}</a>")
-    
-    total_pages = math.ceil(total / MAX_BTN)
-    
-    # 🔥 FIXED HERE: Using variable instead of joining inside f-string
-    files_text = "\n\n".join(list_items)
+    remember_cursor(session, key, act_src, lang, quality, 0, files)
 
-    cap = (
-        f"<b>👑 Search: {search}\n"
-        f"🎬 Total: {total}\n"
-        f"📚 Source: {act_src.upper()}\n"
-        f"📄 Page: 1/{total_pages}</b>\n\n"
-        f"{files_text}"
+    cap, markup = render_page(
+        query.message.chat.id, req, mid, search, files, total,
+        next_off, 1, act_src, lang, quality
     )
-
-    # Build Buttons
-    btn = []
-    nav = [InlineKeyboardButton(f"📄 1/{total_pages}", callback_data="pages")]
-    if next_off:
-        nav.append(InlineKeyboardButton("Next »", callback_data=f"nav_{req}_{key}_{next_off}_{act_src}"))
-    btn.append(nav)
-
-    col_btn = []
-    for c in ["primary", "cloud", "archive"]:
-        tick = "✅" if c == act_src else "📂"
-        col_btn.append(InlineKeyboardButton(f"{tick} {c.title()}", callback_data=f"coll_{req}_{key}_{c}"))
-    btn.append(col_btn)
-    btn.append([InlineKeyboardButton("❌ Close", callback_data="close_data")])
-
     try:
-        await query.message.edit_text(cap, reply_markup=InlineKeyboardMarkup(btn), disable_web_page_preview=True)
+        await query.message.edit_text(cap, reply_markup=markup, disable_web_page_preview=True)
     except:
         pass
     await query.answer()
+    prefetch_next(key, session, act_src, lang, quality, next_off)
+    return True
+
+# ─────────────────────────────────────────────
+# 🔤 SPELL SUGGESTION HANDLER
+# ─────────────────────────────────────────────
+@Client.on_callback_query(filters.regex(r"^spell_"))
+async def spell_handler(client, query):
+    try:
+        _, req, mid, idx = query.data.split("_", 3)
+        if int(req) != query.from_user.id:
+            return await query.answer("❌ Not for you!", show_alert=True)
+    except:
+        return
+
+    if IS_PREMIUM and not await is_premium(query.from_user.id, client):
+        return await query.answer("❌ Premium Expired!", show_alert=True)
+
+    session = await load_session(f"{query.message.chat.id}-{mid}")
+    target = query.message.reply_to_message
+    if not session or not session.suggestions or not target:
+        return await query.answer("❌ Search Expired! Search again.", show_alert=True)
+
+    chat_id = query.message.chat.id if query.message.chat.type != enums.ChatType.PRIVATE else None
+    wait = await search_wait(client, query.from_user.id, chat_id, premium=True if IS_PREMIUM else None)
+    if wait:
+        return await query.answer(f"⏳ Too many searches! Try again in {max(int(wait), 1)}s.", show_alert=True)
+
+    await query.answer()
+    try: await query.message.delete()
+    except: pass
+    await auto_filter(client, target, search=session.suggestions[int(idx)])
 
 @Client.on_callback_query(filters.regex("^close_data$"))
 async def close_cb(c, q):
@@ -1,14 +1,113 @@
-import re
 import time
 import asyncio
+import logging
 from hydrogram import Client, filters, enums
 from hydrogram.errors import FloodWait
-from info import ADMINS
-from database.ia_filterdb import save_file
+from info import (
+    ADMINS, INDEX_CHECKPOINT, INDEX_AUTO_RESUME, INDEX_WORKERS, INDEX_RATE, INDEX_PROGRESS_SECS
+)
+from database.ia_filterdb import BulkSaver
+from database.users_chats_db import db
 from hydrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from utils import temp, get_readable_time
+from utils import get_readable_time, TokenBucket
 
-lock = asyncio.Lock()
+logger = logging.getLogger(__name__)
+
+# ─────────────────────────────────────────────
+# 📋 INDEXING JOB QUEUE
+# ─────────────────────────────────────────────
+class IndexJob:
+    __slots__ = ("job_id", "chat", "lst_msg_id", "skip", "collection", "counters", "msg", "cancel", "running")
+
+    def __init__(self, chat, lst_msg_id, skip, collection, msg, counters=None):
+        self.job_id = job_key(chat, collection)
+        self.chat = chat
+        self.lst_msg_id = lst_msg_id
+        self.skip = skip
+        self.collection = collection
+        self.counters = counters
+        self.msg = msg
+        self.cancel = asyncio.Event()   # per-job cancel token
+        self.running = False
+
+
+class IndexQueue:
+    """
+    FIFO of IndexJobs run by `workers` tasks. All jobs draw their
+    get_messages calls from one shared TokenBucket, so parallel jobs
+    together stay under Telegram's flood limit.
+    """
+
+    def __init__(self, workers=INDEX_WORKERS, rate=INDEX_RATE):
+        self.workers = max(workers, 1)
+        self.budget = TokenBucket(rate) if rate > 0 else None
+        self.jobs = {}                  # job_id -> IndexJob (queued + running)
+        self._queue = None
+        self._tasks = []
+
+    def submit(self, bot, job):
+        """
+        Queue a job. Returns None if duplicate, else (ahead, waits): queued
+        jobs ahead of it (running ones not counted) and whether it has to
+        wait for a worker at all.
+        """
+        if job.job_id in self.jobs:
+            return None
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._tasks = [asyncio.create_task(self._worker(bot)) for _ in range(self.workers)]
+        running = sum(1 for j in self.jobs.values() if j.running)
+        queued = len(self.jobs) - running       # waiting jobs, new one not counted yet
+        self.jobs[job.job_id] = job
+        self._queue.put_nowait(job)
+        # Free worker for it (after the queued ones) → starts now
+        return queued, queued >= self.workers - running
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if not job:
+            return False
+        job.cancel.set()
+        return True
+
+    async def _worker(self, bot):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.cancel.is_set():
+                    await db.delete_index_job(job.job_id)
+                    await job.msg.edit("🚫 Indexing cancelled before it started.")
+                    continue
+                job.running = True
+                await job.msg.edit(f"Starting Indexing to <b>{job.collection.upper()}</b> collection...")
+                await index_files_to_db(
+                    job.lst_msg_id, job.chat, job.msg, bot, job.skip,
+                    job.collection, job.counters, job.cancel, self.budget
+                )
+            except Exception as e:
+                logger.error(f"Indexing job {job.job_id} failed: {e}")
+            finally:
+                self.jobs.pop(job.job_id, None)
+                self._queue.task_done()
+
+
+index_queue = IndexQueue()
+
+
+async def enqueue_index(bot, msg, chat, lst_msg_id, skip, collection, counters=None):
+    job = IndexJob(chat, lst_msg_id, skip, collection, msg, counters)
+    res = index_queue.submit(bot, job)
+    if res is None:
+        return await msg.edit(f"⏳ <code>{chat}</code> is already queued/indexing into <b>{collection.upper()}</b>.")
+    ahead, waits = res
+    if waits:
+        await msg.edit(
+            f"📋 Queued for <b>{collection.upper()}</b> — <code>{ahead}</code> job(s) ahead, "
+            f"waiting for a free worker.",
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton('CANCEL', callback_data=f'index#cancel#{job.job_id}')
+            ]])
+        )
 
 @Client.on_callback_query(filters.regex(r'^index'))
 async def index_files(bot, query):
@@ -86,18 +185,32 @@ async def index_files(bot, query):
         collection = data_parts[5]
         
         msg = query.message
-        await msg.edit(f"Starting Indexing to <b>{collection.upper()}</b> collection...")
         
         try:
             chat = int(chat)
         except:
             chat = chat
         
-        await index_files_to_db(int(lst_msg_id), chat, msg, bot, int(skip), collection)
+        await enqueue_index(bot, msg, chat, int(lst_msg_id), int(skip), collection)
     
     elif ident == 'cancel':
-        temp.CANCEL = True
-        await query.message.edit("Trying to cancel Indexing...")
+        if index_queue.cancel(data_parts[2]):
+            await query.message.edit("Trying to cancel Indexing...")
+        else:
+            await query.answer("Nothing to cancel.", show_alert=True)
+
+    elif ident == 'resume':
+        job = await db.get_index_job(data_parts[2])
+        if not job:
+            return await query.message.edit("❌ Indexing job not found (already finished?).")
+        await enqueue_index(
+            bot, query.message, job["chat"], job["lst_msg_id"], job["current"],
+            job["collection"], job.get("counters")
+        )
+
+    elif ident == 'discard':
+        await db.delete_index_job(data_parts[2])
+        await query.message.edit("🗑 Indexing job discarded.")
 
 
 # Auto-index when forwarded message or channel link is sent
@@ -108,9 +221,6 @@ async def auto_index(bot, message):
         if not message.forward_from_chat:
             return
     
-    if lock.locked():
-        return await message.reply('⏳ Wait until previous indexing process completes.')
-    
     # Handle forwarded messages
     if message.forward_from_chat and message.forward_from_chat.type == enums.ChatType.CHANNEL:
         last_msg_id = message.forward_from_message_id
@@ -139,6 +249,12 @@ async def auto_index(bot, message):
 
     # Show Initial Options (Direct Skip 0 OR Custom Skip)
     buttons = [
+        [InlineKeyboardButton(
+            f"♻️ RESUME {job['collection'].upper()} (from {job['current']})",
+            callback_data=f"index#resume#{job['_id']}"
+        )]
+        for job in await db.get_index_jobs(chat_id)
+    ] + [
         [
             InlineKeyboardButton('⚡ START INDEXING (Skip 0)', callback_data=f'index#yes#{chat_id}#{last_msg_id}#0')
         ],
@@ -158,112 +274,211 @@ async def auto_index(bot, message):
     )
 
 
-async def index_files_to_db(lst_msg_id, chat, msg, bot, skip, collection_type="primary"):
+MIN_FILE_SIZE = 2097152  # 2 MB — छोटी files (samples/junk) index नहीं होतीं
+
+
+def indexable_media(message):
+    """(media, None) if the message should be saved, else (None, skip reason)"""
+    if message.empty:
+        return None, "deleted"
+    if not message.media:
+        return None, "no_media"
+    if message.media not in [enums.MessageMediaType.VIDEO, enums.MessageMediaType.DOCUMENT]:
+        return None, "unsupported"
+    media = getattr(message, message.media.value, None)
+    if not media:
+        return None, "unsupported"
+    if (getattr(media, 'file_size', 0) or 0) < MIN_FILE_SIZE:
+        return None, "badfiles"
+    media.caption = message.caption
+    return media, None
+
+
+def job_key(chat, collection_type):
+    return f"{chat}_{collection_type}"
+
+
+async def resume_index_jobs(bot):
+    """Startup: resume (INDEX_AUTO_RESUME) or offer to resume unfinished jobs"""
+    try:
+        jobs = await db.get_index_jobs()
+    except Exception as e:
+        return logger.error(f"Error loading indexing jobs: {e}")
+    for job in jobs:
+        admin = job.get("user_id") or ADMINS[0]
+        text = (
+            f"⚠️ <b>Unfinished Indexing Job</b>\n\n"
+            f"📢 Channel: <code>{job['chat']}</code>\n"
+            f"📚 Collection: <code>{job['collection'].upper()}</code>\n"
+            f"📨 Progress: <code>{job['current']}/{job['lst_msg_id']}</code>\n"
+            f"📁 Saved: <code>{job.get('counters', {}).get('inserted', 0)}</code>"
+        )
+        try:
+            if INDEX_AUTO_RESUME:
+                msg = await bot.send_message(admin, text + "\n\n♻️ Resuming automatically...")
+                await enqueue_index(
+                    bot, msg, job["chat"], job["lst_msg_id"], job["current"],
+                    job["collection"], job.get("counters")
+                )
+            else:
+                await bot.send_message(admin, text, reply_markup=InlineKeyboardMarkup([[
+                    InlineKeyboardButton("♻️ RESUME", callback_data=f"index#resume#{job['_id']}"),
+                    InlineKeyboardButton("🗑 DISCARD", callback_data=f"index#discard#{job['_id']}")
+                ]]))
+        except Exception as e:
+            logger.error(f"Error resuming indexing job {job['_id']}: {e}")
+
+
+async def index_files_to_db(lst_msg_id, chat, msg, bot, skip, collection_type="primary",
+                            counters=None, cancel=None, budget=None):
+    """
+    `counters` (from a saved job) continue the totals of an interrupted run.
+    Every INDEX_CHECKPOINT messages the buffer is flushed and the position
+    saved, so a restart resumes from there instead of from `skip`.
+    `cancel` is the job's cancel token, `budget` the queue's shared TokenBucket.
+    """
+    counters = counters or {}
     start_time = time.time()
-    total_files = 0
-    duplicate = 0
-    errors = 0
-    deleted = 0
-    no_media = 0
-    unsupported = 0
-    badfiles = 0
+    saver = BulkSaver(collection_type)
+    saver.inserted = counters.get("inserted", 0)
+    saver.duplicate = counters.get("duplicate", 0)
+    saver.errors = counters.get("errors", 0)
+    deleted = counters.get("deleted", 0)
+    no_media = counters.get("no_media", 0)
+    unsupported = counters.get("unsupported", 0)
+    badfiles = counters.get("badfiles", 0)
     current = skip
-    
-    async with lock:
-        try:
-            async for message in bot.iter_messages(chat, lst_msg_id, skip):
+    job_id = job_key(chat, collection_type)
+    saved_before = saver.inserted
+
+    def progress_text():
+        elapsed = max(time.time() - start_time, 1e-6)
+        msg_rate = (current - skip) / elapsed
+        save_rate = (saver.inserted - saved_before) / elapsed
+        eta = get_readable_time((lst_msg_id - current) / msg_rate) if msg_rate else "—"
+        avg_ms = saver.write_time / saver.batches * 1000 if saver.batches else 0
+        return (
+            f"<b>📊 Indexing Progress</b>\n"
+            f"📚 Collection: <code>{collection_type.upper()}</code>\n"
+            f"⏱ Time: <code>{get_readable_time(elapsed)}</code> | ETA: <code>{eta}</code>\n\n"
+            f"📨 Total Received: <code>{current}/{lst_msg_id}</code>\n"
+            f"📁 Saved: <code>{saver.inserted}</code>\n"
+            f"🔄 Duplicates: <code>{saver.duplicate}</code>\n"
+            f"🗑 Deleted: <code>{deleted}</code>\n"
+            f"❌ No Media: <code>{no_media + unsupported}</code>\n"
+            f"⚠️ Unsupported: <code>{unsupported}</code>\n"
+            f"❗ Errors: <code>{saver.errors}</code>\n"
+            f"🚫 Bad Files: <code>{badfiles}</code>\n\n"
+            f"⚡ <code>{msg_rate:.1f}</code> msgs/s | <code>{save_rate:.1f}</code> saves/s\n"
+            f"🗄 DB batch: <code>{saver.last_latency * 1000:.0f}</code> ms last, "
+            f"<code>{avg_ms:.0f}</code> ms avg ({saver.batches} batches)"
+        )
+
+    async def report_progress():
+        # अलग task: Telegram edit / FloodWait indexing loop को कभी नहीं रोकते
+        btn = InlineKeyboardMarkup([[
+            InlineKeyboardButton('CANCEL', callback_data=f'index#cancel#{job_id}')
+        ]])
+        while True:
+            await asyncio.sleep(INDEX_PROGRESS_SECS)
+            try:
+                await msg.edit_text(progress_text(), reply_markup=btn)
+            except FloodWait as e:
+                await asyncio.sleep(e.value)
+            except Exception:
+                pass
+
+    async def checkpoint():
+        await saver.flush()
+        await db.save_index_job(job_id, {
+            "chat": chat,
+            "collection": collection_type,
+            "lst_msg_id": lst_msg_id,
+            "current": current,
+            "user_id": msg.chat.id,
+            "updated": time.time(),
+            "counters": {
+                "inserted": saver.inserted, "duplicate": saver.duplicate,
+                "errors": saver.errors, "deleted": deleted, "no_media": no_media,
+                "unsupported": unsupported, "badfiles": badfiles
+            }
+        })
+
+    reporter = asyncio.create_task(report_progress())
+    try:
+        await checkpoint()
+        async for message in bot.iter_messages(chat, lst_msg_id, skip, budget=budget):
+            if cancel is not None and cancel.is_set():
+                reporter.cancel()
                 time_taken = get_readable_time(time.time()-start_time)
+                await saver.flush()
+                await db.delete_index_job(job_id)
+                await msg.edit(
+                    f"<b>✅ Successfully Cancelled!</b>\n"
+                    f"📚 Collection: <code>{collection_type.upper()}</code>\n"
+                    f"⏱ Completed in: <code>{time_taken}</code>\n\n"
+                    f"📁 Saved Files: <code>{saver.inserted}</code>\n"
+                    f"🔄 Duplicates: <code>{saver.duplicate}</code>\n"
+                    f"🗑 Deleted: <code>{deleted}</code>\n"
+                    f"❌ No Media: <code>{no_media + unsupported}</code>\n"
+                    f"⚠️ Unsupported: <code>{unsupported}</code>\n"
+                    f"❗ Errors: <code>{saver.errors}</code>\n"
+                    f"🚫 Bad Files: <code>{badfiles}</code>"
+                )
+                return
+
+            # पिछला message पूरा process हो चुका → यहाँ तक save करना safe है
+            if current > skip and current % INDEX_CHECKPOINT == 0:
+                try:
+                    await checkpoint()
+                except Exception as e:
+                    logger.error(f"Error saving indexing checkpoint: {e}")
                 
-                if temp.CANCEL:
-                    temp.CANCEL = False
-                    await msg.edit(
-                        f"<b>✅ Successfully Cancelled!</b>\n"
-                        f"📚 Collection: <code>{collection_type.upper()}</code>\n"
-                        f"⏱ Completed in: <code>{time_taken}</code>\n\n"
-                        f"📁 Saved Files: <code>{total_files}</code>\n"
-                        f"🔄 Duplicates: <code>{duplicate}</code>\n"
-                        f"🗑 Deleted: <code>{deleted}</code>\n"
-                        f"❌ No Media: <code>{no_media + unsupported}</code>\n"
-                        f"⚠️ Unsupported: <code>{unsupported}</code>\n"
-                        f"❗ Errors: <code>{errors}</code>\n"
-                        f"🚫 Bad Files: <code>{badfiles}</code>"
-                    )
-                    return
-                
-                current += 1
-                
-                if current % 30 == 0:
-                    btn = [[
-                        InlineKeyboardButton('CANCEL', callback_data=f'index#cancel#{chat}#{lst_msg_id}#{skip}')
-                    ]]
-                    try:
-                        await msg.edit_text(
-                            text=f"<b>📊 Indexing Progress</b>\n"
-                            f"📚 Collection: <code>{collection_type.upper()}</code>\n"
-                            f"⏱ Time: <code>{time_taken}</code>\n\n"
-                            f"📨 Total Received: <code>{current}</code>\n"
-                            f"📁 Saved: <code>{total_files}</code>\n"
-                            f"🔄 Duplicates: <code>{duplicate}</code>\n"
-                            f"🗑 Deleted: <code>{deleted}</code>\n"
-                            f"❌ No Media: <code>{no_media + unsupported}</code>\n"
-                            f"⚠️ Unsupported: <code>{unsupported}</code>\n"
-                            f"❗ Errors: <code>{errors}</code>\n"
-                            f"🚫 Bad Files: <code>{badfiles}</code>", 
-                            reply_markup=InlineKeyboardMarkup(btn)
-                        )
-                    except FloodWait as e:
-                        await asyncio.sleep(e.value)
-                    except Exception:
-                        pass
-                
-                if message.empty:
-                    deleted += 1
-                    continue
-                elif not message.media:
-                    no_media += 1
-                    continue
-                elif message.media not in [enums.MessageMediaType.VIDEO, enums.MessageMediaType.DOCUMENT]:
-                    unsupported += 1
-                    continue
-                
-                media = getattr(message, message.media.value, None)
-                if not media:
-                    unsupported += 1
-                    continue
-                
-                # Check file size - skip files under 2 MB (2097152 bytes)
-                file_size = getattr(media, 'file_size', 0)
-                if file_size < 2097152:  # 2 MB in bytes
-                    badfiles += 1
-                    continue
-                
-                media.caption = message.caption
-                file_name = re.sub(r"@\w+|(_|\-|\.|\+)", " ", str(media.file_name))
-                
-                # Save to selected collection
-                sts = await save_file(media, collection_type=collection_type)
+            current += 1
+
+            media, skipped = indexable_media(message)
+            if skipped == "deleted":
+                deleted += 1
+                continue
+            elif skipped == "no_media":
+                no_media += 1
+                continue
+            elif skipped == "unsupported":
+                unsupported += 1
+                continue
+            elif skipped == "badfiles":
+                badfiles += 1
+                continue
                 
-                if sts == 'suc':
-                    total_files += 1
-                elif sts == 'dup':
-                    duplicate += 1
-                elif sts == 'err':
-                    errors += 1
+            # Buffered → bulk insert (every INDEX_BATCH_SIZE files / INDEX_FLUSH_MS)
+            await saver.add(media)
                     
-        except Exception as e:
-            await msg.reply(f'❌ Index canceled due to Error - {e}')
-        else:
-            time_taken = get_readable_time(time.time()-start_time)
-            await msg.edit(
-                f'<b>✅ Successfully Indexed!</b>\n'
-                f'📚 Collection: <code>{collection_type.upper()}</code>\n'
-                f'⏱ Completed in: <code>{time_taken}</code>\n\n'
-                f'📁 Saved Files: <code>{total_files}</code>\n'
-                f'🔄 Duplicates: <code>{duplicate}</code>\n'
-                f'🗑 Deleted: <code>{deleted}</code>\n'
-                f'❌ No Media: <code>{no_media + unsupported}</code>\n'
-                f'⚠️ Unsupported: <code>{unsupported}</code>\n'
-                f'❗ Errors: <code>{errors}</code>\n'
-                f'🚫 Bad Files: <code>{badfiles}</code>'
-            )
-
+    except Exception as e:
+        reporter.cancel()
+        await saver.flush()
+        # Job record बना रहता है → Resume button / अगले startup पर resume
+        await msg.reply(
+            f'❌ Index canceled due to Error - {e}',
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton('♻️ RESUME', callback_data=f'index#resume#{job_id}')
+            ]])
+        )
+    else:
+        reporter.cancel()
+        await saver.flush()
+        await db.delete_index_job(job_id)
+        time_taken = get_readable_time(time.time()-start_time)
+        await msg.edit(
+            f'<b>✅ Successfully Indexed!</b>\n'
+            f'📚 Collection: <code>{collection_type.upper()}</code>\n'
+            f'⏱ Completed in: <code>{time_taken}</code>\n\n'
+            f'📁 Saved Files: <code>{saver.inserted}</code>\n'
+            f'🔄 Duplicates: <code>{saver.duplicate}</code>\n'
+            f'🗑 Deleted: <code>{deleted}</code>\n'
+            f'❌ No Media: <code>{no_media + unsupported}</code>\n'
+            f'⚠️ Unsupported: <code>{unsupported}</code>\n'
+            f'❗ Errors: <code>{saver.errors}</code>\n'
+            f'🚫 Bad Files: <code>{badfiles}</code>'
+        )
+    finally:
+        reporter.cancel()
@@ -0,0 +1,153 @@
+import io
+import time
+import asyncio
+import logging
+from hydrogram import Client, filters
+from hydrogram.errors import FloodWait, RPCError
+from hydrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from info import ADMINS, BIN_CHANNEL, RECONCILE_RATE
+from database.ia_filterdb import COLLECTIONS, iter_file_batches, delete_file_ids
+from utils import TokenBucket, get_readable_time
+
+logger = logging.getLogger(__name__)
+
+# ─────────────────────────────────────────────
+# 🧹 CATALOG RECONCILIATION (DEAD FILE PURGE)
+# ─────────────────────────────────────────────
+# हर file id को BIN_CHANNEL में send_cached_media से test किया जाता है —
+# delivery भी यही call करती है, तो जो यहाँ fail हो वो user को भी fail होगा।
+# Test messages हर batch के बाद एक call में delete हो जाते हैं।
+
+BATCH_SIZE = 100            # delete_messages की max limit भी 100 है
+PROGRESS_EVERY = 10         # seconds between progress edits
+
+# Telegram errors that mean the file itself is gone. FILE_REFERENCE_* नहीं:
+# stored ids में file reference होता ही नहीं, तो वो error हर file पर आ सकता
+# है (→ "unknown", कभी delete नहीं)।
+DEAD_FILE_ERRORS = {"MEDIA_EMPTY", "FILE_ID_INVALID"}
+
+reconcile_cancel = None     # asyncio.Event of the running job, None when idle
+
+
+async def check_file(client, file_id, budget):
+    """'alive' (+ test message id), 'dead' or 'unknown' (any other error)"""
+    while True:
+        await budget.acquire()
+        try:
+            sent = await client.send_cached_media(BIN_CHANNEL, file_id, disable_notification=True)
+            return "alive", sent.id
+        except FloodWait as e:
+            budget.penalize(e.value + 1)
+        except RPCError as e:
+            if e.ID in DEAD_FILE_ERRORS:
+                return "dead", None
+            logger.warning(f"Reconcile: unexpected error for {file_id}: {e}")
+            return "unknown", None
+        except ValueError:
+            return "dead", None     # file id can't even be decoded
+        except Exception as e:
+            logger.warning(f"Reconcile: error for {file_id}: {e}")
+            return "unknown", None
+
+
+async def reconcile_catalog(client, msg, storages, dry_run, cancel):
+    budget = TokenBucket(RECONCILE_RATE)
+    start_time = time.time()
+    last_edit = 0
+    report = {name: {"checked": 0, "alive": 0, "dead": 0, "unknown": 0, "deleted": 0} for name in storages}
+    dead_lines = []
+    btn = InlineKeyboardMarkup([[InlineKeyboardButton("❌ CANCEL", callback_data="recon_cancel")]])
+
+    def summary():
+        lines = [
+            f"⏱ Time: <code>{get_readable_time(time.time() - start_time)}</code>"
+            + (" | 🧪 <b>Dry run</b>" if dry_run else "")
+        ]
+        for name, r in report.items():
+            lines.append(
+                f"\n📚 <b>{name.upper()}</b>: checked <code>{r['checked']}</code>\n"
+                f" • ✅ Alive: <code>{r['alive']}</code> | 💀 Dead: <code>{r['dead']}</code>\n"
+                f" • ❔ Unknown: <code>{r['unknown']}</code> | 🗑 Deleted: <code>{r['deleted']}</code>"
+            )
+        return "\n".join(lines)
+
+    try:
+        for name in storages:
+            r = report[name]
+            async for batch in iter_file_batches(name, BATCH_SIZE):
+                if cancel.is_set():
+                    break
+                results = await asyncio.gather(*(check_file(client, d["_id"], budget) for d in batch))
+
+                dead = []
+                test_msgs = []
+                for doc, (state, test_id) in zip(batch, results):
+                    r[state] += 1
+                    if state == "dead":
+                        dead.append(doc["_id"])
+                        dead_lines.append(f"{name}\t{doc['_id']}\t{doc.get('file_name', '')}")
+                    elif test_id:
+                        test_msgs.append(test_id)
+                r["checked"] += len(batch)
+
+                if test_msgs:
+                    try:
+                        await client.delete_messages(BIN_CHANNEL, test_msgs)
+                    except Exception as e:
+                        logger.warning(f"Reconcile: couldn't clean BIN_CHANNEL: {e}")
+                if dead and not dry_run:
+                    r["deleted"] += await delete_file_ids(dead, name)
+
+                if time.time() - last_edit > PROGRESS_EVERY:
+                    last_edit = time.time()
+                    try:
+                        await msg.edit(f"<b>🧹 Reconciling Catalog...</b>\n\n{summary()}", reply_markup=btn)
+                    except FloodWait as e:
+                        await asyncio.sleep(e.value)
+                    except Exception:
+                        pass
+            if cancel.is_set():
+                break
+    except Exception as e:
+        logger.error(f"Reconcile failed: {e}")
+        await msg.reply(f"❌ Reconcile stopped due to Error - {e}")
+
+    title = "🚫 Reconcile Cancelled" if cancel.is_set() else "✅ Reconcile Complete"
+    await msg.edit(f"<b>{title}</b>\n\n{summary()}")
+    if dead_lines:
+        report_file = io.BytesIO("\n".join(dead_lines).encode())
+        report_file.name = "dead_files.txt"
+        await msg.reply_document(report_file, caption=f"💀 {len(dead_lines)} dead file(s)")
+
+
+@Client.on_message(filters.command("reconcile") & filters.user(ADMINS))
+async def reconcile_cmd(client, message):
+    global reconcile_cancel
+    args = [a.lower() for a in message.command[1:]]
+    dry_run = "dry" in args
+    storage = next((a for a in args if a != "dry"), "all")
+    if storage not in ["primary", "cloud", "archive", "all"]:
+        return await message.reply("Usage: `/reconcile [primary|cloud|archive|all] [dry]`")
+    if reconcile_cancel is not None:
+        return await message.reply("⏳ A reconcile job is already running.")
+
+    storages = list(COLLECTIONS) if storage == "all" else [storage]
+    msg = await message.reply(f"🧹 Reconciling `{storage}`{' (dry run)' if dry_run else ''}...")
+    reconcile_cancel = asyncio.Event()
+
+    async def run():
+        global reconcile_cancel
+        try:
+            await reconcile_catalog(client, msg, storages, dry_run, reconcile_cancel)
+        finally:
+            reconcile_cancel = None
+
+    asyncio.create_task(run())
+
+
+@Client.on_callback_query(filters.regex(r"^recon_cancel$") & filters.user(ADMINS))
+async def reconcile_cancel_cb(client, query):
+    if reconcile_cancel is None:
+        return await query.answer("Nothing to cancel.", show_alert=True)
+    reconcile_cancel.set()
+    await query.answer("Cancelling after this batch...")
@@ -3,6 +3,8 @@ import asyncio
 import re
 import aiohttp
 import os
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from hydrogram.errors import FloodWait
 from hydrogram import enums
@@ -21,11 +23,9 @@ class temp(object):
     BANNED_USERS = []
     BANNED_CHATS = []
     ME = None
-    CANCEL = False
     U_NAME = None
     B_NAME = None
     SETTINGS = {}
-    FILES = {}
     USERS_CANCEL = False
     GROUPS_CANCEL = False
     BOT = None
@@ -52,6 +52,10 @@ async def is_premium(user_id, bot):
     """Check if user has active premium subscription"""
     if not IS_PREMIUM:
         return True
+    return await has_premium_plan(user_id, bot)
+
+async def has_premium_plan(user_id, bot):
+    """Real plan status, even when IS_PREMIUM gating is off (e.g. rate limits)"""
     if user_id in ADMINS:
         return True
 
@@ -150,6 +154,206 @@ async def save_group_settings(group_id, key, value):
 async def is_subscribed(bot, query):
     return []
 
+# ─────────────────────────────────────────────
+# 🪣 RATE BUDGET (TOKEN BUCKET)
+# ─────────────────────────────────────────────
+class TokenBucket:
+    """
+    `rate` tokens per second, bursts up to `capacity`. acquire() waits in
+    FIFO order, so one bucket can be shared by several tasks.
+    """
+    __slots__ = ("rate", "capacity", "tokens", "stamp", "blocked_until", "_lock")
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = None
+
+    def _refill(self):
+        # block के दौरान tokens जमा नहीं होते
+        now = time.monotonic()
+        since = max(self.stamp, self.blocked_until)
+        if now > since:
+            self.tokens = min(self.capacity, self.tokens + (now - since) * self.rate)
+        self.stamp = now
+
+    async def acquire(self, n=1):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            self._refill()
+            while True:
+                wait = self.blocked_until - time.monotonic()
+                if wait <= 0 and self.tokens >= n:
+                    break
+                await asyncio.sleep(wait if wait > 0 else (n - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= n
+
+    def penalize(self, seconds):
+        """
+        Nobody gets a token for `seconds` from now (e.g. a FloodWait).
+        Overlapping penalties don't add up: the later deadline wins.
+        """
+        self._refill()
+        self.tokens = min(self.tokens, 0)
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+class RateLimiter:
+    """
+    Non-blocking token bucket per key (user / chat id). A key costs one
+    [tokens, stamp, scale] list; keys stay in last-use order and are dropped
+    once idle long enough to be full again, so eviction never changes a
+    result. `scale` multiplies both rate and burst (premium = bigger bucket)
+    and is remembered with the bucket, so callers only need it for new keys.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.idle = self.burst / rate if rate > 0 else 0
+        self.allowed = 0
+        self.limited = 0
+        self._buckets = OrderedDict()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def __contains__(self, key):
+        bucket = self._buckets.get(key)
+        return bucket is not None and time.monotonic() - bucket[1] < self.idle
+
+    def _evict(self, now):
+        while self._buckets:
+            key, bucket = next(iter(self._buckets.items()))
+            if now - bucket[1] < self.idle:
+                break
+            del self._buckets[key]
+
+    def acquire(self, key, scale=None):
+        """0 if allowed (one token taken), else seconds until the next token"""
+        if self.rate <= 0:
+            return 0
+        now = time.monotonic()
+        self._evict(now)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            scale = scale or 1
+            bucket = self._buckets[key] = [self.burst * scale, now, scale]
+        else:
+            if scale:
+                bucket[2] = scale
+            scale = bucket[2]
+            bucket[0] = min(self.burst * scale, bucket[0] + (now - bucket[1]) * self.rate * scale)
+            bucket[1] = now
+            self._buckets.move_to_end(key)
+        rate = self.rate * scale
+        if bucket[0] < 1:
+            self.limited += 1
+            return (1 - bucket[0]) / rate
+        bucket[0] -= 1
+        self.allowed += 1
+        return 0
+
+    def stats(self):
+        return {"keys": len(self._buckets), "allowed": self.allowed, "limited": self.limited}
+
+# ─────────────────────────────────────────────
+# 🗂 SESSION STORE (LRU + TTL + BYTE BUDGET)
+# ─────────────────────────────────────────────
+class _Slot:
+    __slots__ = ("value", "expires", "size")
+
+    def __init__(self, value, expires, size):
+        self.value = value
+        self.expires = expires
+        self.size = size
+
+
+class SessionStore:
+    """
+    Per-message UI state. Every get/put pushes an entry's expiry to
+    now + ttl and moves it to the LRU end, so LRU order is also expiry
+    order: expired entries are always dropped before a live one. Live
+    entries are evicted only when live data alone exceeds `max_bytes`.
+    Values must provide nbytes() (approximate size).
+    """
+
+    def __init__(self, ttl, max_bytes):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        """Alive check that doesn't refresh expiry or LRU position"""
+        slot = self._data.get(key)
+        return slot is not None and slot.expires > time.monotonic()
+
+    def _drop(self, key):
+        self.size -= self._data.pop(key).size
+
+    def _sweep(self, now):
+        while self._data:
+            key, slot = next(iter(self._data.items()))
+            if slot.expires > now:
+                break
+            self._drop(key)
+            self.expired += 1
+
+    def get(self, key):
+        slot = self._data.get(key)
+        now = time.monotonic()
+        if slot is None or slot.expires <= now:
+            if slot is not None:
+                self._drop(key)
+                self.expired += 1
+            self.misses += 1
+            return None
+        slot.expires = now + self.ttl
+        self._data.move_to_end(key)
+        self.hits += 1
+        return slot.value
+
+    def put(self, key, value):
+        """Insert or replace (also re-measures a value that grew)"""
+        now = time.monotonic()
+        if key in self._data:
+            self._drop(key)
+        slot = _Slot(value, now + self.ttl, value.nbytes())
+        self._data[key] = slot
+        self.size += slot.size
+        self._sweep(now)
+        while self.size > self.max_bytes and len(self._data) > 1:
+            self._drop(next(iter(self._data)))
+            self.evicted += 1
+
+    def pop(self, key):
+        if key in self._data:
+            self._drop(key)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "size": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "hit_rate": round(self.hits * 100 / lookups, 1) if lookups else 0.0
+        }
+
 # ─────────────────────────────────────────────
 # 🖼 IMAGE UPLOAD (Non-Blocking AIOHTTP)
 # ─────────────────────────────────────────────